@@ -18,6 +18,7 @@ The script will:
 Safe to interrupt and restart - picks up where it left off via DuckDB state.
 """
 import argparse
+import logging
 import sys
 import time
 from datetime import datetime, timedelta, timezone
@@ -206,6 +207,8 @@ Examples:
     )
 
     args = parser.parse_args()
+    # Page/slice progress from wallet_metrics is logged at INFO.
+    logging.basicConfig(level=logging.INFO, format="  %(message)s")
 
     # Calculate target date
     target_date = calculate_target_date(args.target_days)
@@ -2,9 +2,48 @@
 
 from __future__ import annotations
 
+import atexit
+import threading
 from pathlib import Path
 
+import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARQUET_ROW_GROUP_SIZE = 122_880
+
+_SCRATCH_CONNECTION: duckdb.DuckDBPyConnection | None = None
+_SCRATCH_LOCK = threading.Lock()
+
+
+def scratch_connection() -> duckdb.DuckDBPyConnection:
+    """Return a cursor on a shared in-memory database for frame-only queries.
+
+    Opening a fresh ``duckdb.connect()`` costs ~10ms per call; a cursor on
+    the cached in-memory connection is nearly free. Views registered on the
+    cursor are private to it and vanish when it is closed.
+    """
+    global _SCRATCH_CONNECTION
+    with _SCRATCH_LOCK:
+        if _SCRATCH_CONNECTION is None:
+            conn = duckdb.connect()
+            # Naive timestamps in frames and parquet are UTC; pin the session
+            # zone so TIMESTAMP/TIMESTAMPTZ casts never use the host zone.
+            conn.execute("SET TimeZone = 'UTC'")
+            _SCRATCH_CONNECTION = conn
+        return _SCRATCH_CONNECTION.cursor()
+
+
+def close_scratch_connection() -> None:
+    global _SCRATCH_CONNECTION
+    with _SCRATCH_LOCK:
+        if _SCRATCH_CONNECTION is not None:
+            _SCRATCH_CONNECTION.close()
+            _SCRATCH_CONNECTION = None
+
+
+atexit.register(close_scratch_connection)
 
 
 def read_parquet(path: Path) -> pd.DataFrame | None:
@@ -17,3 +56,24 @@ def read_parquet(path: Path) -> pd.DataFrame | None:
 def write_parquet(path: Path, df: pd.DataFrame) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     df.to_parquet(path, index=False)
+
+
+def write_parquet_table(path: Path, table: pa.Table) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(table, path)
+
+
+def write_parquet_zstd(path: Path, df: pd.DataFrame) -> None:
+    """Write a frame via DuckDB's multithreaded Parquet writer (ZSTD, dictionary)."""
+    if df.empty:
+        # Empty object columns carry no type information for DuckDB to infer.
+        write_parquet(path, df)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    target = str(path).replace("'", "''")
+    with scratch_connection() as conn:
+        conn.register("frame", df)
+        conn.execute(
+            f"COPY frame TO '{target}' (FORMAT PARQUET, COMPRESSION zstd, "
+            f"ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE})"
+        )
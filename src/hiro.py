@@ -31,6 +31,9 @@ ADDRESS_BALANCES_ENDPOINT = f"{HIRO_BASE}/extended/v1/address"
 
 HIRO_CACHE_DIR = cfg.CACHE_DIR / "hiro"
 HIRO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+HIRO_POOL_MAXSIZE = 32  # keep-alive connections for concurrent balance fetches
+
+_HIRO_SESSIONS: dict[str | None, requests.Session] = {}
 
 
 def _rewards_cache_path(start_height: int | None, end_height: int | None) -> Path:
@@ -41,11 +44,16 @@ def _rewards_cache_path(start_height: int | None, end_height: int | None) -> Pat
 
 
 def _hiro_session() -> requests.Session:
-    headers = {"User-Agent": "stx-labs-notebook/1.0"}
+    """Return a pooled session shared across calls (one per API key)."""
     api_key = _get_api_key()
-    if api_key:
-        headers["X-API-Key"] = api_key
-    return build_session(headers)
+    session = _HIRO_SESSIONS.get(api_key)
+    if session is None:
+        headers = {"User-Agent": "stx-labs-notebook/1.0"}
+        if api_key:
+            headers["X-API-Key"] = api_key
+        session = build_session(headers, pool_maxsize=HIRO_POOL_MAXSIZE)
+        _HIRO_SESSIONS[api_key] = session
+    return session
 
 
 def _get_api_key() -> str | None:
@@ -11,6 +11,7 @@ from pathlib import Path
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
 from tenacity import (
     retry,
     retry_if_exception,
@@ -70,10 +71,20 @@ def _should_retry(status_code: int, retry_config=DEFAULT_RETRY_CONFIG) -> bool:
     return status_code in retry_config.status_forcelist
 
 
-def build_session(default_headers: Mapping[str, str] | None = None) -> requests.Session:
+def build_session(
+    default_headers: Mapping[str, str] | None = None,
+    *,
+    pool_maxsize: int | None = None,
+) -> requests.Session:
     session = requests.Session()
     if default_headers:
         session.headers.update(default_headers)
+    if pool_maxsize:
+        # Keep enough keep-alive connections for concurrent workers sharing
+        # the session; urllib3 defaults to 10 per host.
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
     return session
 
 
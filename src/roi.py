@@ -37,9 +37,10 @@ class RetentionPoint:
 def _cohort_sizes(first_seen: pd.DataFrame) -> pd.Series:
     if first_seen.empty:
         return pd.Series(dtype=int)
-    df = first_seen.copy()
-    df["activation_date"] = pd.to_datetime(df["first_seen"], utc=True).dt.floor("D")
-    cohort = df.groupby("activation_date")["address"].nunique()
+    # first_seen holds one row per address, so a group size is the distinct count.
+    activation = pd.to_datetime(first_seen["first_seen"], utc=True).dt.floor("D")
+    cohort = activation[first_seen["address"].notna()].groupby(activation).size()
+    cohort.index.name = "activation_date"
     cohort.name = "cohort_size"
     return cohort
 
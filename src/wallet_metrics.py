@@ -2,21 +2,32 @@
 
 from __future__ import annotations
 
+from collections import OrderedDict, deque
 from collections.abc import Sequence
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import UTC, date, datetime, timedelta
 from pathlib import Path
 from typing import Any, Callable, Mapping
 
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import shutil
+import threading
 import time
 import logging
 
 from . import config as cfg
-from .cache_utils import read_parquet, write_parquet
+from .cache_utils import (
+    read_parquet,
+    scratch_connection,
+    write_parquet,
+    write_parquet_table,
+    write_parquet_zstd,
+)
 from .hiro import fetch_transactions_page, fetch_address_balances
 
 LOGGER = logging.getLogger(__name__)
@@ -29,8 +40,15 @@ SEGMENTED_RETENTION_PATH = WALLET_CACHE_DIR / "retention_segmented.parquet"
 SEGMENTED_RETENTION_SURVIVAL_PATH = WALLET_CACHE_DIR / "retention_segmented_survival.parquet"
 METRICS_DATA_START = pd.Timestamp("2024-12-23T00:00:00Z")
 MICROSTX_PER_STX = 1_000_000
+NS_PER_DAY = 86_400_000_000_000
+# Categories listed alphabetically so sorting matches the former str column.
+SEGMENT_DTYPE = pd.CategoricalDtype(["All", "Non-value", "Value"])
 TRANSACTION_PAGE_LIMIT = 50
 DEFAULT_MAX_PAGES = 10_000
+INSERT_BATCH_PAGES = 50  # pages buffered per DuckDB insert during syncs
+COMPACT_AFTER_PAGES = 200  # historical pages that trigger a clustered rewrite
+HISTORY_SLICE_SECONDS = 86_400  # time slice walked by one historical fetch worker
+HISTORY_FETCH_WORKERS = 4
 DUCKDB_PATH = cfg.DUCKDB_PATH
 FUNDED_D0_COLUMNS = [
     "address",
@@ -42,6 +60,23 @@ FUNDED_D0_COLUMNS = [
     "ingested_at",
     "updated_at",
 ]
+_UTC_MICROS = pa.timestamp("us", tz="UTC")
+TRANSACTION_SCHEMA = pa.schema(
+    [
+        ("tx_id", pa.string()),
+        ("block_time", _UTC_MICROS),
+        ("block_height", pa.int64()),
+        ("sender_address", pa.string()),
+        ("fee_ustx", pa.int64()),
+        ("tx_type", pa.string()),
+        ("canonical", pa.bool_()),
+        ("tx_status", pa.string()),
+        ("burn_block_time", _UTC_MICROS),
+        ("burn_block_height", pa.int64()),
+        ("microblock_sequence", pa.int64()),
+        ("ingested_at", _UTC_MICROS),
+    ]
+)
 
 
 def _utc_now() -> datetime:
@@ -57,29 +92,37 @@ def _resolve_db_path(db_path: Path | None = None) -> Path:
 def _connect(
     read_only: bool = False, *, db_path: Path | None = None
 ) -> duckdb.DuckDBPyConnection:
+    """Open a new connection to the database file; callers close it.
+
+    Connections are not shared between calls: an open connection holds the
+    file lock, and the backfill script and dashboards run as separate
+    processes against the same file. Keep ``with _connect() as conn:``
+    blocks to the queries themselves, not around network fetches.
+    """
     path = str(_resolve_db_path(db_path))
     return duckdb.connect(path, read_only=read_only)
 
 
+TRANSACTIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        tx_id VARCHAR PRIMARY KEY,
+        block_time TIMESTAMP,
+        block_height BIGINT,
+        sender_address VARCHAR,
+        fee_ustx BIGINT,
+        tx_type VARCHAR,
+        canonical BOOLEAN,
+        tx_status VARCHAR,
+        burn_block_time TIMESTAMP,
+        burn_block_height BIGINT,
+        microblock_sequence BIGINT,
+        ingested_at TIMESTAMP
+    );
+"""
+
+
 def _ensure_schema(conn: duckdb.DuckDBPyConnection) -> None:
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS transactions (
-            tx_id VARCHAR PRIMARY KEY,
-            block_time TIMESTAMP,
-            block_height BIGINT,
-            sender_address VARCHAR,
-            fee_ustx BIGINT,
-            tx_type VARCHAR,
-            canonical BOOLEAN,
-            tx_status VARCHAR,
-            burn_block_time TIMESTAMP,
-            burn_block_height BIGINT,
-            microblock_sequence BIGINT,
-            ingested_at TIMESTAMP
-        );
-        """
-    )
+    conn.execute(TRANSACTIONS_DDL.format(table="transactions"))
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS wallet_balances (
@@ -114,104 +157,119 @@ def _ensure_schema(conn: duckdb.DuckDBPyConnection) -> None:
         pass
 
 
-def _prepare_transactions(results: list[dict[str, Any]]) -> pd.DataFrame:
-    records: list[dict[str, Any]] = []
-    for tx in results:
-        sender = tx.get("sender_address")
-        canonical = tx.get("canonical", False)
-        status = tx.get("tx_status")
-        block_time = tx.get("block_time")
-        if not sender or not canonical or status != "success" or block_time is None:
-            continue
-        fee_raw = tx.get("fee")
-        if fee_raw is None:
-            fee_raw = tx.get("fee_rate")
-        try:
-            fee_ustx = int(fee_raw)
-        except (TypeError, ValueError):
-            fee_ustx = 0
-        records.append(
-            {
-                "tx_id": tx.get("tx_id"),
-                "block_time": pd.to_datetime(block_time, unit="s", utc=True),
-                "block_height": tx.get("block_height"),
-                "sender_address": sender,
-                "fee_ustx": fee_ustx,
-                "tx_type": tx.get("tx_type"),
-                "canonical": canonical,
-                "tx_status": status,
-                "burn_block_time": (
-                    pd.to_datetime(tx.get("burn_block_time"), unit="s", utc=True)
-                    if tx.get("burn_block_time") is not None
-                    else pd.NaT
-                ),
-                "burn_block_height": tx.get("burn_block_height"),
-                "microblock_sequence": tx.get("microblock_sequence"),
-                "ingested_at": pd.Timestamp(_utc_now()),
-            }
-        )
-    if not records:
-        return pd.DataFrame(
-            columns=[
-                "tx_id",
-                "block_time",
-                "block_height",
-                "sender_address",
-                "fee_ustx",
-                "tx_type",
-                "canonical",
-                "tx_status",
-                "burn_block_time",
-                "burn_block_height",
-                "microblock_sequence",
-                "ingested_at",
-            ]
-        )
-    df = pd.DataFrame.from_records(records)
-    return df
+def _epoch_seconds(values: list[Any]) -> pa.Array:
+    """Epoch-second values as UTC microsecond timestamps.
 
+    Numeric strings and floats are coerced like fees are; ``None`` and
+    anything unparseable becomes null.
+    """
+    seconds = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    micros = (seconds.astype("float64") * 1_000_000).round()
+    missing = micros.isna().to_numpy()
+    return pa.array(
+        micros.fillna(0).to_numpy(dtype="int64"), _UTC_MICROS, mask=missing
+    )
 
-def _insert_transactions(conn: duckdb.DuckDBPyConnection, frame: pd.DataFrame) -> int:
-    if frame.empty:
+
+def _prepare_transactions(results: list[dict[str, Any]]) -> pa.Table:
+    """Filter a page to successful canonical sends and build its Arrow table.
+
+    Rows are filtered on the raw dicts first; each kept field is then read
+    into one list and converted to an Arrow column, so pages go to DuckDB
+    without a pandas round trip.
+    """
+    kept = [
+        tx
+        for tx in results
+        if tx.get("sender_address")
+        and tx.get("canonical")
+        and tx.get("tx_status") == "success"
+        and tx.get("block_time") is not None
+    ]
+    fees = [
+        tx.get("fee") if tx.get("fee") is not None else tx.get("fee_rate")
+        for tx in kept
+    ]
+    now = _utc_now()
+    table = pa.table(
+        [
+            pa.array([tx.get("tx_id") for tx in kept], pa.string()),
+            _epoch_seconds([tx["block_time"] for tx in kept]),
+            pa.array([tx.get("block_height") for tx in kept], pa.int64()),
+            pa.array([tx["sender_address"] for tx in kept], pa.string()),
+            pa.array(
+                pd.to_numeric(pd.Series(fees, dtype=object), errors="coerce")
+                .fillna(0)
+                .astype("int64")
+                .to_numpy(),
+                pa.int64(),
+            ),
+            pa.array([tx.get("tx_type") for tx in kept], pa.string()),
+            pa.array([True] * len(kept), pa.bool_()),
+            pa.array(["success"] * len(kept), pa.string()),
+            _epoch_seconds([tx.get("burn_block_time") for tx in kept]),
+            pa.array([tx.get("burn_block_height") for tx in kept], pa.int64()),
+            pa.array([tx.get("microblock_sequence") for tx in kept], pa.int64()),
+            pa.array([now] * len(kept), _UTC_MICROS),
+        ],
+        schema=TRANSACTION_SCHEMA,
+    )
+    if table["block_time"].null_count:
+        # Block times that do not parse as epoch seconds.
+        table = table.filter(pc.is_valid(table["block_time"]))
+    return table
+
+
+def _at_or_after(rows: pa.Table, start_time: int) -> pa.ChunkedArray:
+    """Mask of rows whose burn (else block) time is at or after ``start_time``."""
+    times = pc.coalesce(rows["burn_block_time"], rows["block_time"])
+    bound = pa.scalar(start_time * 1_000_000, times.type)
+    return pc.fill_null(pc.greater_equal(times, bound), True)
+
+
+def _prepare_page(results: list[dict[str, Any]]) -> tuple[pa.Table, int | None]:
+    """Prepare a page of results and its next cursor (from every row)."""
+    return _prepare_transactions(results), _page_cursor(results)
+
+
+def _insert_transactions(conn: duckdb.DuckDBPyConnection, rows: pa.Table) -> int:
+    """Upsert transaction rows on tx_id straight from an Arrow batch.
+
+    Timestamp columns arrive as UTC Arrow timestamps and are stored as naive
+    UTC; the conversion happens inside DuckDB while reading the registered
+    batch. A re-fetched tx_id replaces the stored row, so the latest fetch
+    wins. ``rows`` must not repeat a tx_id (see ``_flush_transactions``).
+    """
+    if not rows.num_rows:
         return 0
-    store_df = frame.copy()
-    store_df["block_time"] = (
-        store_df["block_time"].dt.tz_convert("UTC").dt.tz_localize(None)
+    to_naive = ", ".join(
+        f"timezone('UTC', {col}) AS {col}"
+        for col in ("block_time", "burn_block_time", "ingested_at")
     )
-    if store_df["burn_block_time"].notna().any():
-        store_df["burn_block_time"] = (
-            store_df["burn_block_time"].dt.tz_convert("UTC").dt.tz_localize(None)
+    conn.register("transactions_batch", rows)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO transactions "
+            f"SELECT * REPLACE ({to_naive}) FROM transactions_batch"
         )
-    store_df["ingested_at"] = (
-        store_df["ingested_at"].dt.tz_convert("UTC").dt.tz_localize(None)
-    )
-    conn.register("incoming_transactions", store_df)
-    conn.execute(
-        """
-        INSERT OR REPLACE INTO transactions BY NAME
-        SELECT * FROM incoming_transactions;
-        """
-    )
-    conn.unregister("incoming_transactions")
-    return len(store_df)
+    finally:
+        conn.unregister("transactions_batch")
+    return rows.num_rows
 
 
-def _insert_wallet_balances(conn: duckdb.DuckDBPyConnection, frame: pd.DataFrame) -> int:
-    if frame.empty:
+def _insert_wallet_balances(conn: duckdb.DuckDBPyConnection, rows: pa.Table) -> int:
+    """Upsert balance rows (``ingested_at`` as naive UTC) straight from Arrow."""
+    if not rows.num_rows:
         return 0
-    store_df = frame.copy()
-    store_df["ingested_at"] = (
-        store_df["ingested_at"].dt.tz_convert("UTC").dt.tz_localize(None)
-    )
-    conn.register("incoming_wallet_balances", store_df)
-    conn.execute(
-        """
-        INSERT OR REPLACE INTO wallet_balances BY NAME
-        SELECT * FROM incoming_wallet_balances;
-        """
-    )
-    conn.unregister("incoming_wallet_balances")
-    return len(store_df)
+    conn.register("wallet_balances_batch", rows)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO wallet_balances BY NAME "
+            "SELECT * FROM wallet_balances_batch"
+        )
+    finally:
+        conn.unregister("wallet_balances_batch")
+    return rows.num_rows
 
 
 def _extract_stx_balance(payload: dict[str, Any] | None) -> int:
@@ -230,20 +288,65 @@ def _extract_stx_balance(payload: dict[str, Any] | None) -> int:
 
 
 def _page_cursor(results: list[dict[str, Any]]) -> int | None:
-    timestamps: list[int] = []
-    for tx in results:
-        cursor_candidate = tx.get("burn_block_time")
-        if cursor_candidate is None:
-            cursor_candidate = tx.get("block_time")
-        if cursor_candidate is None:
-            continue
-        try:
-            timestamps.append(int(cursor_candidate))
-        except (TypeError, ValueError):
-            continue
-    if not timestamps:
+    """Earliest burn (else block) time on the page, minus one second."""
+    candidates = [
+        tx.get("burn_block_time")
+        if tx.get("burn_block_time") is not None
+        else tx.get("block_time")
+        for tx in results
+    ]
+    times = [value for value in candidates if type(value) is int]
+    if len(times) < len(candidates):
+        # Rare non-int values (numeric strings, floats) go through pandas'
+        # coercion; anything unparseable is skipped.
+        others = [value for value in candidates if type(value) is not int]
+        parsed = pd.to_numeric(pd.Series(others, dtype=object), errors="coerce")
+        times.extend(int(value) for value in parsed.dropna())
+    if not times:
         return None
-    return min(timestamps) - 1
+    return min(times) - 1
+
+
+def _compact_transactions(conn: duckdb.DuckDBPyConnection) -> None:
+    """Rewrite ``transactions`` in block_time order so zone maps prune scans.
+
+    Backfills prepend older pages while the live sync appends new ones, which
+    leaves row groups with overlapping min/max ranges. A clustered rewrite
+    restores tight ranges for ``block_time >= ?`` filters.
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute("DROP TABLE IF EXISTS transactions_ordered")
+        conn.execute(TRANSACTIONS_DDL.format(table="transactions_ordered"))
+        conn.execute(
+            "INSERT INTO transactions_ordered "
+            "SELECT * FROM transactions ORDER BY block_time"
+        )
+        conn.execute("DROP TABLE transactions")
+        conn.execute("ALTER TABLE transactions_ordered RENAME TO transactions")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("CHECKPOINT")
+
+
+def _flush_transactions(
+    conn: duckdb.DuckDBPyConnection, pending: list[pa.Table]
+) -> int:
+    """Insert buffered page tables in one statement and clear the buffer."""
+    if not pending:
+        return 0
+    batch = pa.concat_tables(pending)
+    pending.clear()
+    tx_ids = batch["tx_id"]
+    if pc.count_distinct(tx_ids).as_py() < batch.num_rows:
+        # Overlapping pages repeat rows; keep the most recently fetched copy.
+        repeated = pd.Series(tx_ids.to_numpy(zero_copy_only=False)).duplicated(
+            keep="last"
+        )
+        batch = batch.filter(pa.array(~repeated.to_numpy()))
+    return _insert_transactions(conn, batch)
 
 
 def _sync_latest_transactions(
@@ -251,39 +354,125 @@ def _sync_latest_transactions(
     *,
     max_pages: int,
 ) -> None:
-    max_row = conn.execute("SELECT MAX(block_time) FROM transactions").fetchone()
+    max_row = conn.execute(
+        "SELECT MAX(block_time), MAX(burn_block_time) FROM transactions"
+    ).fetchone()
     max_time = (
         pd.Timestamp(max_row[0]).tz_localize("UTC") if max_row and max_row[0] else None
     )
+    max_burn_time = (
+        pd.Timestamp(max_row[1]).tz_localize("UTC") if max_row and max_row[1] else None
+    )
     cursor_to: int | None = None
     pages = 0
-    while pages < max_pages:
+    pending: list[pa.Table] = []
+    try:
+        while pages < max_pages:
+            pages += 1
+            LOGGER.info("Fetching latest page %d/%d", pages, max_pages)
+            payload = fetch_transactions_page(
+                limit=TRANSACTION_PAGE_LIMIT,
+                offset=0,
+                include_unanchored=False,
+                force_refresh=cursor_to is None,
+                ttl_seconds=300 if cursor_to is None else 1800,
+                end_time=cursor_to,
+            )
+            results = payload.get("results", [])
+            if not results:
+                break
+            rows, cursor_candidate = _prepare_page(results)
+            if rows.num_rows:
+                pending.append(rows)
+                if len(pending) >= INSERT_BATCH_PAGES:
+                    _flush_transactions(conn, pending)
+                newest_to_consider = pc.min(rows["block_time"]).as_py()
+            else:
+                newest_to_consider = None
+            if cursor_candidate is None:
+                break
+            cursor_to = cursor_candidate
+            if max_time is not None:
+                if newest_to_consider is not None and newest_to_consider <= max_time:
+                    break
+                # The rest of the gap down to the stored head is bounded, so
+                # page it as concurrent time slices instead of one cursor. The
+                # cursor walks burn times, which trail block times, so the
+                # head is located by its burn time as well.
+                _sync_time_slices(
+                    conn,
+                    end_time=cursor_to,
+                    start_time=int((max_burn_time or max_time).timestamp()),
+                    budget=_PageBudget(max_pages - pages),
+                    label="latest",
+                )
+                break
+    finally:
+        _flush_transactions(conn, pending)
+
+
+class _PageBudget:
+    """Thread-safe page allowance shared by historical fetch workers."""
+
+    def __init__(self, pages: int) -> None:
+        self._remaining = pages
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0:
+                return False
+            self._remaining -= 1
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._remaining = 0
+
+
+@dataclass(slots=True)
+class _HistorySlice:
+    tables: list[pa.Table]
+    pages: int
+    complete: bool  # walked down to the slice start
+    exhausted: bool  # the API has nothing older
+
+
+def _fetch_history_slice(
+    end_time: int, start_time: int, budget: _PageBudget, clip: bool = False
+) -> _HistorySlice:
+    """Walk pages backwards from ``end_time`` until the cursor passes ``start_time``.
+
+    With ``clip`` the rows of the last page that fall before ``start_time``
+    are dropped: an older slice fetches them as well.
+    """
+    tables: list[pa.Table] = []
+    pages = 0
+    cursor_to = end_time
+    while budget.claim():
         pages += 1
-        print(f"  Fetching latest page {pages}/{max_pages}...", flush=True)
         payload = fetch_transactions_page(
             limit=TRANSACTION_PAGE_LIMIT,
             offset=0,
             include_unanchored=False,
-            force_refresh=cursor_to is None,
-            ttl_seconds=300 if cursor_to is None else 1800,
+            force_refresh=False,
+            ttl_seconds=1800,
             end_time=cursor_to,
         )
         results = payload.get("results", [])
         if not results:
-            break
-        frame = _prepare_transactions(results)
-        if not frame.empty:
-            _insert_transactions(conn, frame)
-            newest_to_consider = frame["block_time"].min()
-        else:
-            newest_to_consider = None
-        cursor_candidate = _page_cursor(results)
-        if cursor_candidate is None:
-            break
-        cursor_to = cursor_candidate
-        if max_time is not None and newest_to_consider is not None:
-            if newest_to_consider <= max_time:
-                break
+            return _HistorySlice(tables, pages, complete=True, exhausted=True)
+        rows, next_cursor = _prepare_page(results)
+        if clip and next_cursor is not None and next_cursor < start_time:
+            rows = rows.filter(_at_or_after(rows, start_time))
+        if rows.num_rows:
+            tables.append(rows)
+        if next_cursor is None or next_cursor >= cursor_to:
+            return _HistorySlice(tables, pages, complete=True, exhausted=True)
+        if next_cursor < start_time:
+            return _HistorySlice(tables, pages, complete=True, exhausted=False)
+        cursor_to = next_cursor
+    return _HistorySlice(tables, pages, complete=False, exhausted=False)
 
 
 def _sync_historical_transactions(
@@ -291,7 +480,12 @@ def _sync_historical_transactions(
     *,
     cutoff: datetime,
     max_pages: int,
-) -> None:
+) -> int:
+    """Backfill transactions older than the stored minimum down to ``cutoff``.
+
+    The span is paged by ``_sync_time_slices``; it stops at the first
+    incomplete slice, so the next run resumes from the stored minimum.
+    """
     min_row = conn.execute(
         "SELECT MIN(block_time), MIN(burn_block_time) FROM transactions"
     ).fetchone()
@@ -303,63 +497,115 @@ def _sync_historical_transactions(
         pd.Timestamp(min_row[1]).tz_localize("UTC") if min_row and min_row[1] else None
     )
     if min_time is not None and min_time <= target_time:
-        return
+        return 0
     cursor_source = min_burn_time or min_time
     cursor_to = (
         int(cursor_source.timestamp()) - 1
         if cursor_source is not None
         else int(_utc_now().timestamp())
     )
-    pages = 0
-    while pages < max_pages and cursor_to is not None:
-        pages += 1
-        print(f"  Fetching historical page {pages}/{max_pages}...", flush=True)
-        payload = fetch_transactions_page(
-            limit=TRANSACTION_PAGE_LIMIT,
-            offset=0,
-            include_unanchored=False,
-            force_refresh=False,
-            ttl_seconds=1800,
-            end_time=cursor_to,
-        )
-        results = payload.get("results", [])
-        if not results:
-            break
-        frame = _prepare_transactions(results)
-        if not frame.empty:
-            _insert_transactions(conn, frame)
-            min_time = (
-                frame["block_time"].min()
-                if min_time is None
-                else min(min_time, frame["block_time"].min())
-            )
-            if min_time <= target_time:
-                break
-        next_cursor = _page_cursor(results)
-        if next_cursor is None or next_cursor >= cursor_to:
-            break
-        cursor_to = next_cursor
+    return _sync_time_slices(
+        conn,
+        end_time=cursor_to,
+        start_time=int(target_time.timestamp()),
+        budget=_PageBudget(max_pages),
+        label="historical",
+    )
 
 
-def _select_existing_balance_addresses(
+def _sync_time_slices(
+    conn: duckdb.DuckDBPyConnection,
+    *,
+    end_time: int,
+    start_time: int,
+    budget: _PageBudget,
+    label: str,
+) -> int:
+    """Page ``[start_time, end_time]`` as concurrent slices and store them in order.
+
+    The span is cut into ``HISTORY_SLICE_SECONDS`` slices that are paged by
+    ``HISTORY_FETCH_WORKERS`` threads. Slices are consumed newest first and
+    the sync stops at the first incomplete one, so stored rows stay
+    contiguous. Returns the number of pages fetched.
+    """
+    # Every slice but the oldest drops rows past its start, which the next
+    # slice fetches anyway; the oldest keeps them so the stored minimum
+    # reaches ``start_time``.
+    slices = [
+        (
+            end,
+            max(end - HISTORY_SLICE_SECONDS + 1, start_time),
+            end - HISTORY_SLICE_SECONDS + 1 > start_time,
+        )
+        for end in range(end_time, start_time - 1, -HISTORY_SLICE_SECONDS)
+    ]
+    pages = 0
+    pending: list[pa.Table] = []
+    with ThreadPoolExecutor(max_workers=HISTORY_FETCH_WORKERS) as executor:
+        # Keep only HISTORY_FETCH_WORKERS slices in flight so the page budget
+        # is spent on the newest slices rather than on the queue tail.
+        futures: deque[Future[_HistorySlice]] = deque(
+            executor.submit(_fetch_history_slice, end, start, budget, clip)
+            for end, start, clip in slices[:HISTORY_FETCH_WORKERS]
+        )
+        queued = iter(slices[HISTORY_FETCH_WORKERS:])
+        try:
+            for index in range(1, len(slices) + 1):
+                fetched = futures.popleft().result()
+                upcoming = next(queued, None)
+                if upcoming is not None:
+                    end, start, clip = upcoming
+                    futures.append(
+                        executor.submit(_fetch_history_slice, end, start, budget, clip)
+                    )
+                pages += fetched.pages
+                LOGGER.info(
+                    "Fetched %s slice %d/%d (%d pages)",
+                    label,
+                    index,
+                    len(slices),
+                    fetched.pages,
+                )
+                for rows in fetched.tables:
+                    pending.append(rows)
+                    if len(pending) >= INSERT_BATCH_PAGES:
+                        _flush_transactions(conn, pending)
+                if fetched.exhausted or not fetched.complete:
+                    break
+        finally:
+            # Stop the slices still in flight past the break.
+            budget.close()
+            for future in futures:
+                future.cancel()
+            _flush_transactions(conn, pending)
+    return pages
+
+
+def _select_missing_balance_addresses(
     conn: duckdb.DuckDBPyConnection,
     snapshot_date: date,
     addresses: list[str],
-) -> set[str]:
+) -> list[str]:
+    """Return requested addresses without a snapshot for the date (anti-join)."""
     if not addresses:
-        return set()
-    result = conn.execute(
-        """
-        SELECT address
-        FROM wallet_balances
-        WHERE as_of_date = ?
-          AND address IN (SELECT * FROM UNNEST(?))
-        """,
-        [snapshot_date, addresses],
-    ).fetchdf()
-    if result.empty:
-        return set()
-    return set(result["address"].astype(str).tolist())
+        return []
+    conn.register(
+        "requested_addresses", pa.table({"address": pa.array(addresses, pa.string())})
+    )
+    try:
+        rows = conn.execute(
+            """
+            SELECT r.address
+            FROM requested_addresses r
+            ANTI JOIN wallet_balances w
+              ON w.address = r.address AND w.as_of_date = ?
+            ORDER BY r.address
+            """,
+            [snapshot_date],
+        ).fetchall()
+    finally:
+        conn.unregister("requested_addresses")
+    return [str(row[0]) for row in rows]
 
 
 def ensure_wallet_balances(
@@ -391,78 +637,145 @@ def ensure_wallet_balances(
     snapshot_date = as_of_date or _utc_now().date()
     with _connect(db_path=db_path) as conn:
         _ensure_schema(conn)
-        existing = _select_existing_balance_addresses(conn, snapshot_date, deduped)
-    missing = [addr for addr in deduped if addr not in existing]
+        missing = _select_missing_balance_addresses(conn, snapshot_date, deduped)
     if not missing:
         return 0
-    
-    rows: list[dict[str, Any]] = []
+    # The network phase can run for a long time; hold no connection (and so
+    # no file lock) while it does, and reopen only for the upsert.
+    rows = _fetch_wallet_balances(
+        missing,
+        snapshot_date=snapshot_date,
+        funded_threshold_stx=funded_threshold_stx,
+        fetcher=fetcher,
+        delay_seconds=delay_seconds,
+        batch_size=batch_size,
+        max_workers=max_workers,
+    )
+    if not rows.num_rows:
+        return 0
+    with _connect(db_path=db_path) as conn:
+        return _insert_wallet_balances(conn, rows)
+
+
+def _fetch_wallet_balances(
+    missing: list[str],
+    *,
+    snapshot_date: date,
+    funded_threshold_stx: float,
+    fetcher: Callable[..., dict[str, Any]],
+    delay_seconds: float,
+    batch_size: int | None,
+    max_workers: int,
+) -> pa.Table:
+    """Fetch balances for ``missing`` and return the rows to upsert as Arrow."""
+    # Preallocated column buffers written by index from the workers; the
+    # funded flags and the Arrow table are built once at the end.
+    balances = np.zeros(len(missing), dtype="int64")
+    fetched = np.zeros(len(missing), dtype=bool)
+    ingested_ns = np.zeros(len(missing), dtype="int64")
     funded_threshold_ustx = int(funded_threshold_stx * MICROSTX_PER_STX)
+    log_each_address = LOGGER.isEnabledFor(logging.DEBUG)
     
-    def fetch_single_balance(addr: str) -> dict[str, Any] | None:
-        """Fetch balance for a single address, return row dict or None if failed."""
+    def fetch_single_balance(index: int) -> None:
+        """Fetch the balance for ``missing[index]`` into the column buffers."""
+        addr = missing[index]
         try:
             payload = fetcher(addr)
             balance_ustx = _extract_stx_balance(payload)
-            balance_stx = balance_ustx / MICROSTX_PER_STX
-            funded = bool(balance_ustx >= funded_threshold_ustx)
-            LOGGER.info(
-                "✓ Fetched balance for %s: %.6f STX (funded: %s)",
-                addr,
-                balance_stx,
-                funded,
-            )
-            return {
-                "address": addr,
-                "as_of_date": snapshot_date,
-                "balance_ustx": balance_ustx,
-                "funded": funded,
-                "ingested_at": pd.Timestamp(_utc_now()),
-            }
+            if log_each_address:
+                LOGGER.debug(
+                    "✓ Fetched balance for %s: %.6f STX (funded: %s)",
+                    addr,
+                    balance_ustx / MICROSTX_PER_STX,
+                    balance_ustx >= funded_threshold_ustx,
+                )
+            balances[index] = balance_ustx
+            fetched[index] = True
         except Exception as exc:  # pragma: no cover - network failure path
             LOGGER.warning("✗ Failed to fetch balance for %s: %s", addr, exc)
             # Don't insert failed addresses - they'll be retried on next run
             # This allows the script to be resumable
-            return None
     
     # Process in batches if specified, otherwise process all sequentially
     if batch_size and batch_size > 0:
-        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+        batches = [
+            range(i, min(i + batch_size, len(missing)))
+            for i in range(0, len(missing), batch_size)
+        ]
         LOGGER.info(
             "Processing %d addresses in %d batches of %d (max %d concurrent requests per batch)",
             len(missing), len(batches), batch_size, max_workers
         )
     else:
-        batches = [[addr] for addr in missing]
+        batches = [range(i, i + 1) for i in range(len(missing))]
         max_workers = 1  # Sequential if no batching
     
-    for batch_idx, batch in enumerate(batches):
-        # Process batch with concurrent requests
-        batch_rows = []
-        with ThreadPoolExecutor(max_workers=min(max_workers, len(batch))) as executor:
-            future_to_addr = {executor.submit(fetch_single_balance, addr): addr for addr in batch}
-            for future in as_completed(future_to_addr):
-                addr = future_to_addr[future]
+    # One pool for every batch: threads (and their pooled HTTP connections)
+    # are reused instead of being spawned and torn down per batch.
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+        for batch_idx, batch in enumerate(batches):
+            # Process batch with concurrent requests
+            batch_started = time.perf_counter()
+            future_to_index = {
+                executor.submit(fetch_single_balance, index): index for index in batch
+            }
+            for future in as_completed(future_to_index):
                 try:
-                    row = future.result()
-                    if row:
-                        batch_rows.append(row)
+                    future.result()
                 except Exception as exc:
-                    LOGGER.warning("✗ Exception fetching balance for %s: %s", addr, exc)
-        
-        rows.extend(batch_rows)
-        
-        # Delay between batches to respect rate limits
-        if batch_idx < len(batches) - 1:
-            time.sleep(delay_seconds)
-            LOGGER.info("Completed batch %d/%d, processed %d/%d addresses", 
-                       batch_idx + 1, len(batches), len(rows), len(missing))
+                    LOGGER.warning(
+                        "✗ Exception fetching balance for %s: %s",
+                        missing[future_to_index[future]],
+                        exc,
+                    )
+            
+            # One ingestion stamp per batch rather than a Timestamp per address.
+            ingested_ns[batch.start:batch.stop] = pd.Timestamp(_utc_now()).value
+            if batch_size and batch_size > 0:
+                # Per-address lines are DEBUG only; this is the INFO summary.
+                batch_fetched = fetched[batch.start:batch.stop]
+                succeeded = int(np.count_nonzero(batch_fetched))
+                LOGGER.info(
+                    "Completed batch %d/%d in %.2fs: %d succeeded (%d funded), "
+                    "%d failed, processed %d/%d addresses",
+                    batch_idx + 1,
+                    len(batches),
+                    time.perf_counter() - batch_started,
+                    succeeded,
+                    int(np.count_nonzero(
+                        batch_fetched
+                        & (balances[batch.start:batch.stop] >= funded_threshold_ustx)
+                    )),
+                    len(batch) - succeeded,
+                    batch.stop,
+                    len(missing),
+                )
+            
+            # Delay between batches to respect rate limits
+            if batch_idx < len(batches) - 1:
+                time.sleep(delay_seconds)
     
-    # Insert all rows, including failed ones (marked as unfunded)
-    with _connect(db_path=db_path) as conn:
-        _ensure_schema(conn)
-        inserted = _insert_wallet_balances(conn, pd.DataFrame(rows))
-    return inserted
+    balances = balances[fetched]
+    funded = balances >= funded_threshold_ustx
+    LOGGER.info(
+        "Fetched %d/%d balances for %s (%d funded)",
+        len(balances),
+        len(missing),
+        snapshot_date,
+        int(np.count_nonzero(funded)),
+    )
+    # Arrow columns straight from the buffers; no DataFrame is built.
+    return pa.table(
+        {
+            "address": pa.array(np.asarray(missing, dtype=object)[fetched], pa.string()),
+            "as_of_date": pa.array(
+                np.full(len(balances), np.datetime64(snapshot_date, "D")), pa.date32()
+            ),
+            "balance_ustx": pa.array(balances, pa.int64()),
+            "funded": pa.array(funded, pa.bool_()),
+            "ingested_at": pa.array(ingested_ns[fetched], pa.timestamp("ns")),
+        }
+    )
 
 
 def load_wallet_balances(
@@ -479,29 +792,42 @@ def load_wallet_balances(
             columns=["address", "as_of_date", "balance_ustx", "funded", "ingested_at"]
         )
     with _connect(read_only=True, db_path=db_path) as conn:
+        conn.register(
+            "requested_addresses", pa.table({"address": pa.array(deduped, pa.string())})
+        )
         try:
-            df = conn.execute(
+            table = conn.execute(
+                """
+                SELECT w.address, w.as_of_date, w.balance_ustx, w.funded, w.ingested_at
+                FROM wallet_balances w
+                SEMI JOIN requested_addresses r USING (address)
                 """
-                SELECT address, as_of_date, balance_ustx, funded, ingested_at
-                FROM wallet_balances
-                WHERE address IN (SELECT * FROM UNNEST(?))
-                """,
-                [deduped],
-            ).fetchdf()
+            ).fetch_arrow_table()
         except duckdb.CatalogException:
             return pd.DataFrame(
                 columns=["address", "as_of_date", "balance_ustx", "funded", "ingested_at"]
             )
-    if df.empty:
-        return df
+        finally:
+            conn.unregister("requested_addresses")
+    # Addresses repeat across snapshot dates; dictionary-encode them so pandas
+    # holds one string per wallet and groups on integer codes.
+    table = table.set_column(
+        0, "address", table.column("address").dictionary_encode()
+    )
+    df = table.to_pandas(date_as_object=False)
     df["as_of_date"] = pd.to_datetime(df["as_of_date"])
     target_date = pd.to_datetime(as_of_date or _utc_now().date())
     df = df[df["as_of_date"] <= target_date]
     if max_age_days is not None:
         min_date = target_date - pd.Timedelta(days=max_age_days)
         df = df[df["as_of_date"] >= min_date]
-    df = df.sort_values("as_of_date").drop_duplicates("address", keep="last")
-    return df.reset_index(drop=True)
+    if not df.empty:
+        latest = df.groupby("address", sort=False, observed=True)["as_of_date"].idxmax()
+        df = df.loc[latest.to_numpy()]
+    df = df.reset_index(drop=True)
+    # The codes only serve the grouping; callers get plain string addresses.
+    df["address"] = df["address"].astype(object)
+    return df
 
 
 def ensure_transaction_history(
@@ -518,11 +844,13 @@ def ensure_transaction_history(
             conn.execute("DELETE FROM transactions")
         _sync_latest_transactions(conn, max_pages=max_pages)
         cutoff = _utc_now() - timedelta(days=max_days)
-        _sync_historical_transactions(
+        historical_pages = _sync_historical_transactions(
             conn,
             cutoff=cutoff,
             max_pages=max_pages,
         )
+        if historical_pages >= COMPACT_AFTER_PAGES:
+            _compact_transactions(conn)
 
 
 @dataclass(slots=True)
@@ -579,6 +907,7 @@ def load_recent_wallet_activity(
         raise ValueError("max_days must be positive")
     start_cutoff = _utc_now() - timedelta(days=max_days)
     cutoff_naive = start_cutoff.astimezone(UTC).replace(tzinfo=None)
+    coverage_naive = METRICS_DATA_START.floor("D").tz_convert(None).to_pydatetime()
     with _connect(read_only=True, db_path=db_path) as conn:
         df = conn.execute(
             """
@@ -586,13 +915,17 @@ def load_recent_wallet_activity(
                 tx_id,
                 sender_address AS address,
                 block_time,
-                fee_ustx,
-                tx_type
+                DATE_TRUNC('day', block_time) AS activity_date,
+                fee_ustx
             FROM transactions
             WHERE block_time >= ?
+              AND block_time >= ?
+              AND sender_address IS NOT NULL
+              AND coalesce(canonical, FALSE)
+              AND tx_status = 'success'
             ORDER BY block_time DESC;
             """,
-            [cutoff_naive],
+            [cutoff_naive, coverage_naive],
         ).df()
     if df.empty:
         return pd.DataFrame(
@@ -602,30 +935,46 @@ def load_recent_wallet_activity(
                 "block_time",
                 "activity_date",
                 "fee_ustx",
-                "tx_type",
             ]
         )
-    df["block_time"] = pd.to_datetime(df["block_time"], utc=True)
-    df["address"] = df["address"].astype(str)
-    df = df[df["address"].notna()]
-    df["activity_date"] = df["block_time"].dt.floor("D")
-    coverage_cutoff = METRICS_DATA_START.floor("D")
-    df = df[df["activity_date"] >= coverage_cutoff]
-    df = df[
-        [
-            "tx_id",
-            "address",
-            "block_time",
-            "activity_date",
-            "fee_ustx",
-            "tx_type",
-        ]
-    ].copy()
+    # block_time is stored as naive UTC, so the SQL day bucket is the UTC day
+    # and both columns only need the zone attached, not re-parsing.
+    df["block_time"] = df["block_time"].dt.tz_localize("UTC")
+    df["activity_date"] = df["activity_date"].dt.tz_localize("UTC")
     return df
 
 
+def open_read_snapshot(db_path: Path | None = None) -> duckdb.DuckDBPyConnection:
+    """Return a read-only connection with a consistent (MVCC) view of the database.
+
+    Prefer this over ``create_db_snapshot`` for in-process readers; a file copy
+    is only needed when another process holds the write lock. The caller
+    closes the connection.
+    """
+    conn = _connect(read_only=True, db_path=db_path)
+    conn.execute("BEGIN TRANSACTION")
+    return conn
+
+
+def export_db_snapshot(target_dir: Path, *, db_path: Path | None = None) -> Path:
+    """Export all tables as ZSTD parquet (plus schema SQL) for shipping elsewhere."""
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = str(target_dir).replace("'", "''")
+    with _connect(read_only=True, db_path=db_path) as conn:
+        conn.execute(
+            f"EXPORT DATABASE '{target}' (FORMAT PARQUET, COMPRESSION zstd)"
+        )
+    return target_dir
+
+
 def create_db_snapshot(destination: Path | None = None) -> Path:
-    """Copy the DuckDB wallet metrics database for read-only use."""
+    """Copy the DuckDB wallet metrics database for read-only use.
+
+    The copy is written with ``COPY FROM DATABASE`` through a read-only
+    connection; when another process (e.g. a running backfill) holds the
+    write lock, the file is copied byte for byte instead. In-process readers
+    should use ``open_read_snapshot`` or ``export_db_snapshot``.
+    """
 
     source = _resolve_db_path()
     if not source.exists():
@@ -635,38 +984,84 @@ def create_db_snapshot(destination: Path | None = None) -> Path:
         timestamp = int(time.time())
         target = cfg.CACHE_DIR / f"wallet_metrics_snapshot_{timestamp}.duckdb"
     target.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(source, target)
+    target.unlink(missing_ok=True)
+    try:
+        conn = _connect(read_only=True, db_path=source)
+    except duckdb.IOException:
+        # Another process holds the lock; the raw file is the only way in.
+        shutil.copy2(source, target)
+        return target
+    # COPY FROM DATABASE reads one MVCC snapshot, so the copy is consistent
+    # and leaves behind the free blocks a byte copy would carry along.
+    attached = str(target).replace("'", "''")
+    with conn:
+        catalog = conn.execute("SELECT current_database()").fetchone()[0]
+        conn.execute(
+            f"ATTACH '{attached}' AS wallet_metrics_snapshot (READ_ONLY false)"
+        )
+        try:
+            conn.execute(
+                f'COPY FROM DATABASE "{catalog}" TO wallet_metrics_snapshot'
+            )
+        finally:
+            conn.execute("DETACH wallet_metrics_snapshot")
     return target
 
 
 def load_first_seen_cache() -> pd.DataFrame:
-    cached = read_parquet(FIRST_SEEN_CACHE_PATH)
-    if cached is None:
+    if not FIRST_SEEN_CACHE_PATH.exists():
         return pd.DataFrame(columns=["address", "first_seen"])
-    cached["first_seen"] = pd.to_datetime(cached["first_seen"], utc=True)
-    cached["address"] = cached["address"].astype(str)
-    cached = cached[cached["first_seen"] >= METRICS_DATA_START]
-    return cached.reset_index(drop=True)
+    # Filter inside the Parquet scan so row groups older than the coverage
+    # start are skipped via their min/max statistics.
+    with scratch_connection() as conn:
+        # Casting in SQL hands pandas UTC-aware timestamps (older caches hold
+        # naive UTC) and plain str addresses, so no parsing pass is needed.
+        cached = conn.execute(
+            """
+            SELECT
+                CAST(address AS VARCHAR) AS address,
+                CAST(first_seen AS TIMESTAMPTZ) AS first_seen
+            FROM read_parquet(?)
+            WHERE CAST(first_seen AS TIMESTAMPTZ) >= ?
+            """,
+            [str(FIRST_SEEN_CACHE_PATH), METRICS_DATA_START.to_pydatetime()],
+        ).fetchdf()
+    # DuckDB labels the zone "Etc/UTC"; relabelling does not touch the values.
+    cached["first_seen"] = cached["first_seen"].dt.tz_convert("UTC")
+    return cached
 
 
 def update_first_seen_cache(activity: pd.DataFrame) -> pd.DataFrame:
     """Persist earliest known transaction timestamp per wallet."""
-    cached = load_first_seen_cache()
     if activity.empty:
-        return cached
+        return load_first_seen_cache()
 
-    current = (
-        activity.groupby("address", as_index=False)["block_time"]
-        .min()
-        .rename(columns={"block_time": "first_seen"})
-    )
-    combined = pd.concat([cached, current], ignore_index=True)
-    combined = combined.sort_values("first_seen").drop_duplicates(
-        subset=["address"], keep="first"
-    )
-    combined["first_seen"] = pd.to_datetime(combined["first_seen"], utc=True)
-    combined = combined[combined["first_seen"] >= METRICS_DATA_START]
-    write_parquet(FIRST_SEEN_CACHE_PATH, combined)
+    # The existing cache is scanned straight from parquet inside the same
+    # aggregate instead of being materialised in pandas first.
+    sources = [
+        "SELECT address, CAST(block_time AS TIMESTAMPTZ) AS first_seen FROM activity"
+    ]
+    params: list[Any] = []
+    if FIRST_SEEN_CACHE_PATH.exists():
+        sources.append(
+            "SELECT address, CAST(first_seen AS TIMESTAMPTZ) FROM read_parquet(?)"
+        )
+        params.append(str(FIRST_SEEN_CACHE_PATH))
+    with scratch_connection() as conn:
+        conn.register("activity", activity[["address", "block_time"]])
+        combined = conn.execute(
+            f"""
+            SELECT CAST(address AS VARCHAR) AS address, MIN(first_seen) AS first_seen
+            FROM ({" UNION ALL ".join(sources)})
+            WHERE first_seen >= ?
+            GROUP BY address
+            ORDER BY first_seen, address
+            """,
+            [*params, METRICS_DATA_START.to_pydatetime()],
+        ).fetchdf()
+    # Addresses come back as str; only the "Etc/UTC" zone label needs fixing.
+    combined["first_seen"] = combined["first_seen"].dt.tz_convert("UTC")
+    write_parquet_zstd(FIRST_SEEN_CACHE_PATH, combined)
     return combined
 
 
@@ -685,9 +1080,29 @@ def _load_funded_d0_cache() -> pd.DataFrame:
     return frame
 
 
+# One-slot memo for _activation_frame: the dashboard/ROI pipelines hand the
+# same first_seen frame to the funding, value-flag and retention helpers.
+_ACTIVATION_MEMO: tuple[tuple[Any, ...], pd.DataFrame] | None = None
+
+
 def _activation_frame(first_seen: pd.DataFrame) -> pd.DataFrame:
+    """Return activation dates per wallet, reusing the last result for the same content.
+
+    The memo is keyed on a hash of every (address, first_seen) pair and each
+    caller gets its own copy, so edits on either side cannot leak through.
+    """
+    global _ACTIVATION_MEMO
     if first_seen.empty:
         return pd.DataFrame(columns=["address", "first_seen", "activation_date"])
+    fingerprint = (len(first_seen), _content_hash(first_seen, ["address", "first_seen"]))
+    memo = _ACTIVATION_MEMO
+    if memo is None or memo[0] != fingerprint:
+        memo = (fingerprint, _build_activation_frame(first_seen))
+        _ACTIVATION_MEMO = memo
+    return memo[1].copy()
+
+
+def _build_activation_frame(first_seen: pd.DataFrame) -> pd.DataFrame:
     frame = first_seen.copy()
     frame["first_seen"] = pd.to_datetime(frame["first_seen"], utc=True)
     frame["address"] = frame["address"].astype(str)
@@ -755,7 +1170,7 @@ def collect_activation_day_funding(
     if activation.empty:
         empty = pd.DataFrame(columns=FUNDED_D0_COLUMNS)
         if persist:
-            write_parquet(FUNDED_D0_CACHE_PATH, empty)
+            write_parquet_zstd(FUNDED_D0_CACHE_PATH, empty)
         return empty
 
     cached = _load_funded_d0_cache()
@@ -775,35 +1190,38 @@ def collect_activation_day_funding(
             return pd.DataFrame(
                 columns=["address", "as_of_date", "balance_ustx", "funded", "ingested_at"]
             )
-        records: list[pd.DataFrame] = []
+        keys = pd.DataFrame(
+            {
+                "address": requests["address"].to_numpy(),
+                "as_of_date": requests["activation_date"].dt.tz_convert(None),
+            }
+        )
         with _connect(read_only=True, db_path=path) as conn:
-            for activation_date, group in requests.groupby("activation_date"):
-                addr_batch = group["address"].tolist()
-                try:
-                    df = conn.execute(
-                        """
-                        SELECT address, as_of_date, balance_ustx, funded, ingested_at
-                        FROM wallet_balances
-                        WHERE as_of_date = ?
-                          AND address IN (SELECT * FROM UNNEST(?))
-                        """,
-                        [activation_date.date(), addr_batch],
-                    ).fetchdf()
-                except duckdb.CatalogException:
-                    continue
-                if df.empty:
-                    continue
-                df["address"] = df["address"].astype(str)
-                df["as_of_date"] = pd.to_datetime(df["as_of_date"], utc=True).dt.floor("D")
-                df["ingested_at"] = pd.to_datetime(df["ingested_at"], utc=True)
-                records.append(df)
-        if not records:
+            conn.register("pending_funding_keys", keys)
+            try:
+                df = conn.execute(
+                    """
+                    SELECT w.address, w.as_of_date, w.balance_ustx, w.funded, w.ingested_at
+                    FROM wallet_balances w
+                    JOIN pending_funding_keys k
+                      ON w.address = k.address
+                     AND w.as_of_date = CAST(k.as_of_date AS DATE)
+                    """
+                ).fetchdf()
+            except duckdb.CatalogException:
+                df = pd.DataFrame()
+            finally:
+                conn.unregister("pending_funding_keys")
+        if df.empty:
             return pd.DataFrame(
                 columns=["address", "as_of_date", "balance_ustx", "funded", "ingested_at"]
             )
-        return pd.concat(records, ignore_index=True)
+        df["address"] = df["address"].astype(str)
+        df["as_of_date"] = pd.to_datetime(df["as_of_date"], utc=True).dt.floor("D")
+        df["ingested_at"] = pd.to_datetime(df["ingested_at"], utc=True)
+        return df
 
-    pending_remaining = pending.copy()
+    pending_remaining = pending
     lookup_paths: list[Path | None] = [db_path, fallback_db_path]
     fetched_frames: list[pd.DataFrame] = []
     for path in lookup_paths:
@@ -813,66 +1231,53 @@ def collect_activation_day_funding(
         if fetched.empty:
             continue
         fetched_frames.append(fetched)
-        found_keys = set(zip(fetched["address"], fetched["as_of_date"]))
-        mask = pending_remaining.apply(
-            lambda row: (row["address"], row["activation_date"].floor("D")) not in found_keys,
-            axis=1,
+        found_keys = pd.MultiIndex.from_arrays([fetched["address"], fetched["as_of_date"]])
+        pending_keys = pd.MultiIndex.from_arrays(
+            [pending_remaining["address"], pending_remaining["activation_date"].dt.floor("D")]
         )
-        pending_remaining = pending_remaining[mask]
+        pending_remaining = pending_remaining[~pending_keys.isin(found_keys)]
 
+    updated_at = pd.Timestamp(_utc_now()).tz_convert("UTC")
     new_rows: list[pd.DataFrame] = []
     if fetched_frames:
         fetched_all = pd.concat(fetched_frames, ignore_index=True)
-        fetched_all = fetched_all.rename(columns={"as_of_date": "snapshot_version"})
-        fetched_all["funded_d0"] = fetched_all["funded"].astype(bool)
-        fetched_all["has_snapshot"] = True
-        fetched_all["updated_at"] = pd.Timestamp(_utc_now()).tz_convert("UTC")
-        fetched_all["activation_date"] = fetched_all["snapshot_version"]
         new_rows.append(
-            fetched_all[
-                [
-                    "address",
-                    "activation_date",
-                    "snapshot_version",
-                    "funded_d0",
-                    "balance_ustx",
-                    "has_snapshot",
-                    "ingested_at",
-                    "updated_at",
-                ]
-            ]
+            pd.DataFrame(
+                {
+                    "address": fetched_all["address"],
+                    "activation_date": fetched_all["as_of_date"],
+                    "funded_d0": fetched_all["funded"].astype(bool),
+                    "balance_ustx": fetched_all["balance_ustx"],
+                    "snapshot_version": fetched_all["as_of_date"],
+                    "has_snapshot": True,
+                    "ingested_at": fetched_all["ingested_at"],
+                    "updated_at": updated_at,
+                },
+                columns=FUNDED_D0_COLUMNS,
+            )
         )
 
     if not pending_remaining.empty:
-        placeholders = pending_remaining.copy()
-        placeholders = placeholders.rename(columns={"activation_date": "snapshot_version"})
-        placeholders["funded_d0"] = False
-        placeholders["balance_ustx"] = pd.NA
-        placeholders["has_snapshot"] = False
-        placeholders["ingested_at"] = pd.NaT
-        placeholders["updated_at"] = pd.Timestamp(_utc_now()).tz_convert("UTC")
-        placeholders["activation_date"] = placeholders["snapshot_version"]
         new_rows.append(
-            placeholders[
-                [
-                    "address",
-                    "activation_date",
-                    "snapshot_version",
-                    "funded_d0",
-                    "balance_ustx",
-                    "has_snapshot",
-                    "ingested_at",
-                    "updated_at",
-                ]
-            ]
+            pd.DataFrame(
+                {
+                    "address": pending_remaining["address"],
+                    "activation_date": pending_remaining["activation_date"],
+                    "funded_d0": False,
+                    "balance_ustx": pd.NA,
+                    "snapshot_version": pending_remaining["activation_date"],
+                    "has_snapshot": False,
+                    "ingested_at": pd.NaT,
+                    "updated_at": updated_at,
+                },
+                columns=FUNDED_D0_COLUMNS,
+            )
         )
 
     base = cached if not cached.empty else pd.DataFrame(columns=FUNDED_D0_COLUMNS)
     if new_rows:
-        updates = pd.concat(new_rows, ignore_index=True)
-        updates = updates[FUNDED_D0_COLUMNS]
-        if not updates.empty:
-            base = pd.concat([base, updates], ignore_index=True)
+        # One concat for cache + fetched + placeholders instead of growing it.
+        base = pd.concat([base, *new_rows], ignore_index=True)
         base = base.sort_values("updated_at").drop_duplicates(
             subset=["address", "activation_date"], keep="last"
         )
@@ -884,21 +1289,30 @@ def collect_activation_day_funding(
     )
     result["has_snapshot"] = result["has_snapshot"].fillna(False)
     result["funded_d0"] = result["funded_d0"].fillna(False)
-    result["balance_ustx"] = result["balance_ustx"].where(result["has_snapshot"], pd.NA)
-    result["snapshot_version"] = result["snapshot_version"].where(
-        result["has_snapshot"], pd.NaT
-    )
-    result["ingested_at"] = result["ingested_at"].where(result["has_snapshot"], pd.NaT)
-    result["updated_at"] = result["updated_at"].where(
-        result["updated_at"].notna(),
-        pd.Timestamp(_utc_now()).tz_convert("UTC"),
-    )
+    result.loc[
+        ~result["has_snapshot"].astype(bool),
+        ["balance_ustx", "snapshot_version", "ingested_at"],
+    ] = None
+    result["updated_at"] = result["updated_at"].fillna(updated_at)
 
     if persist:
-        write_parquet(FUNDED_D0_CACHE_PATH, result[FUNDED_D0_COLUMNS])
+        write_parquet_zstd(FUNDED_D0_CACHE_PATH, result[FUNDED_D0_COLUMNS])
     return result[FUNDED_D0_COLUMNS]
 
 
+def _days_between(start: pd.Series, end: pd.Series) -> np.ndarray:
+    """Whole days from ``start`` to ``end``, matching ``(end - start).dt.days``.
+
+    Subtracts the int64 nanosecond values directly instead of materialising a
+    Timedelta column first. Both inputs must be non-null.
+    """
+    return (_epoch_ns(end) - _epoch_ns(start)) // NS_PER_DAY
+
+
+def _epoch_ns(values: pd.Series) -> np.ndarray:
+    return values.values.astype("datetime64[ns]", copy=False).view("int64")
+
+
 def compute_value_flags(
     activity: pd.DataFrame,
     first_seen: pd.DataFrame,
@@ -926,24 +1340,29 @@ def compute_value_flags(
         result["value_30d"] = False
         return result
 
-    merged["days_since_activation"] = (
-        merged["activity_date"] - merged["activation_date"]
-    ).dt.days
+    merged["days_since_activation"] = _days_between(
+        merged["activation_date"], merged["activity_date"]
+    )
     merged = merged[
         (merged["days_since_activation"] >= 0)
         & (merged["days_since_activation"] <= window_days)
-    ].copy()
-    merged["fee_ustx"] = merged["fee_ustx"].fillna(0)
+    ]
 
-    if merged.empty:
-        fee_totals = {}
-    else:
-        merged["fee_stx"] = merged["fee_ustx"].astype(float) / MICROSTX_PER_STX
-        fee_totals = merged.groupby("address")["fee_stx"].sum().to_dict()
+    # Sum per-row STX like wallet_value.compute_wallet_windows, so both
+    # value_30d flags see the same total at the threshold.
+    codes, addresses = pd.factorize(merged["address"])
+    fee_stx = np.bincount(
+        codes,
+        weights=merged["fee_ustx"].fillna(0).to_numpy(dtype="float64")
+        / MICROSTX_PER_STX,
+        minlength=len(addresses),
+    )
+    fee_totals = pd.Series(fee_stx, index=addresses)
 
     result = activation[["address", "activation_date"]].copy()
     result["value_30d"] = (
-        result["address"].map(fee_totals).fillna(0.0) >= min_fee_stx
+        fee_totals.reindex(result["address"].to_numpy(), fill_value=0.0).to_numpy()
+        >= min_fee_stx
     )
     return result
 
@@ -955,7 +1374,9 @@ def _persist_retention_segmented(
     db_path: Path | None = None,
     persist_db: bool = True,
 ) -> None:
-    write_parquet(output_path, panel)
+    # Convert once: the same Arrow table feeds the parquet file and DuckDB.
+    table = pa.Table.from_pandas(panel, preserve_index=False)
+    write_parquet_table(output_path, table)
     if not persist_db:
         return
     with _connect(db_path=db_path) as conn:
@@ -963,20 +1384,161 @@ def _persist_retention_segmented(
         conn.execute("DELETE FROM retention_segmented")
         if panel.empty:
             return
-        store_df = panel.copy()
-        store_df["updated_at"] = (
-            pd.to_datetime(store_df["updated_at"])
-            .dt.tz_convert("UTC")
-            .dt.tz_localize(None)
-        )
-        if "anchor_window_days" not in store_df.columns:
-            store_df["anchor_window_days"] = pd.NA
-        conn.register("incoming_retention_segmented", store_df)
-        conn.execute(
-            "INSERT OR REPLACE INTO retention_segmented BY NAME "
-            "SELECT * FROM incoming_retention_segmented"
+        conn.register("incoming_retention_segmented", table)
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO retention_segmented BY NAME "
+                "SELECT * REPLACE (timezone('UTC', updated_at) AS updated_at) "
+                "FROM incoming_retention_segmented"
+            )
+        finally:
+            conn.unregister("incoming_retention_segmented")
+
+
+def _retained_by_window(
+    segment_codes: np.ndarray,
+    days: np.ndarray,
+    n_segments: int,
+    windows: Sequence[int],
+    *,
+    mode: str,
+) -> np.ndarray:
+    """Count retained wallets per (segment, window) from per-wallet day counters.
+
+    ``days`` holds each wallet's first return day (cumulative) or last active
+    day (survival); ``-1`` marks wallets that never returned.
+    """
+    max_window = max(windows)
+    # One histogram row per segment; the last bucket collects every day past
+    # the longest window.
+    width = max_window + 2
+    valid = days >= 0
+    buckets = segment_codes[valid] * width + np.minimum(days[valid], max_window + 1)
+    hist = np.bincount(buckets, minlength=n_segments * width).reshape(n_segments, width)
+    window_index = np.asarray(windows, dtype="int64")
+    if mode == "cumulative":
+        return hist.cumsum(axis=1)[:, window_index]
+    return hist[:, ::-1].cumsum(axis=1)[:, ::-1][:, window_index]
+
+
+def _distinct_count(frame: pd.DataFrame, by: str | list[str], column: str) -> pd.Series:
+    """Equivalent of ``frame.groupby(by)[column].nunique()`` on integer codes.
+
+    Group keys come from ``ngroup`` and values from ``factorize``; the
+    (group, value) pairs are deduplicated with one sort and counted with a
+    bincount instead of per-group hashing.
+    """
+    grouped = frame.groupby(by, sort=True)
+    sizes = grouped.size()
+    group_codes = grouped.ngroup().to_numpy(dtype="int64")
+    value_codes, uniques = pd.factorize(frame[column])
+    n_values = max(len(uniques), 1)
+    keys = (group_codes * n_values + value_codes)[value_codes >= 0]
+    keys.sort()
+    if keys.size:
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    return pd.Series(
+        np.bincount(keys // n_values, minlength=len(sizes)),
+        index=sizes.index,
+        name=column,
+    )
+
+
+# Small LRU of folded segment activity keyed by input fingerprints: dashboard
+# refreshes rebuild the cumulative and survival panels from the same frames.
+_SEGMENT_FOLD_CACHE: OrderedDict[tuple[Any, ...], pd.DataFrame] = OrderedDict()
+_SEGMENT_FOLD_CACHE_SIZE = 4
+
+
+def _content_hash(frame: pd.DataFrame, columns: Sequence[str]) -> int:
+    """Hash every value of ``columns``; used as an in-process memo key.
+
+    Object columns go through Python's ``hash`` (cached on the strings), which
+    is an order of magnitude faster than ``hash_pandas_object`` on addresses.
+    """
+    parts = []
+    for column in columns:
+        series = frame[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = _epoch_ns(series)
+        else:
+            values = series.to_numpy()
+        parts.append(
+            hash(tuple(values)) if values.dtype == object else hash(values.tobytes())
         )
-        conn.unregister("incoming_retention_segmented")
+    return hash(tuple(parts))
+
+
+def _activity_fingerprint(activity: pd.DataFrame) -> tuple[Any, ...]:
+    """Content key for an activity frame: length plus a hash of every row.
+
+    Activity loaders do not agree on row order (``load_recent_wallet_activity``
+    returns newest first), so no slice of the frame is guaranteed to see new
+    data; the whole (address, activity_date) columns are hashed instead.
+    """
+    return (len(activity), _content_hash(activity, ["address", "activity_date"]))
+
+
+def _fold_segment_activity(
+    members: pd.DataFrame, activity: pd.DataFrame
+) -> pd.DataFrame:
+    """Fold activity into first-return / last-active day offsets per member wallet.
+
+    Results are memoized on the activity fingerprint plus a full hash of the
+    (much smaller) membership frame. The returned frame is shared between
+    callers and must not be mutated.
+    """
+    key = (
+        _activity_fingerprint(activity),
+        len(members),
+        int(pd.util.hash_pandas_object(members, index=False).sum()),
+    )
+    cached = _SEGMENT_FOLD_CACHE.get(key)
+    if cached is not None:
+        _SEGMENT_FOLD_CACHE.move_to_end(key)
+        return cached
+
+    # Join and fold activity into one counter row per wallet inside DuckDB:
+    # the first return day and the last active day. Every retention window is
+    # derived from these instead of the raw activity.
+    with scratch_connection() as conn:
+        conn.register("segment_members", members)
+        conn.register("segment_activity", activity[["address", "activity_date"]])
+        address_days = conn.execute(
+            """
+            WITH joined AS (
+                SELECT
+                    m.activation_date,
+                    m.address,
+                    m.value_30d,
+                    CAST(
+                        floor(
+                            (epoch_us(a.activity_date) - epoch_us(m.activation_date))
+                            / 86400000000.0
+                        ) AS BIGINT
+                    ) AS days_since_activation
+                FROM segment_activity AS a
+                JOIN segment_members AS m USING (address)
+            )
+            SELECT
+                activation_date,
+                address,
+                value_30d,
+                MIN(days_since_activation) FILTER (WHERE days_since_activation > 0)
+                    AS first_return_days,
+                MAX(days_since_activation) FILTER (WHERE days_since_activation >= 0)
+                    AS last_active_days
+            FROM joined
+            GROUP BY activation_date, address, value_30d
+            """
+        ).fetchdf()
+    address_days["activation_date"] = pd.to_datetime(
+        address_days["activation_date"], utc=True
+    )
+    _SEGMENT_FOLD_CACHE[key] = address_days
+    if len(_SEGMENT_FOLD_CACHE) > _SEGMENT_FOLD_CACHE_SIZE:
+        _SEGMENT_FOLD_CACHE.popitem(last=False)
+    return address_days
 
 
 def compute_segmented_retention_panel(
@@ -1025,16 +1587,17 @@ def compute_segmented_retention_panel(
         return panel
 
     activation = _activation_frame(first_seen)
-    scoped = activation.merge(
-        funded_activation[
-            ["address", "activation_date", "funded_d0", "has_snapshot"]
-        ],
+    # Filter funding rows before joining so the merge only factorizes the
+    # qualifying keys; an inner join then matches left-join-and-filter.
+    funded = funded_activation[
+        funded_activation["funded_d0"].fillna(False).astype(bool)
+        & funded_activation["has_snapshot"].fillna(False).astype(bool)
+    ]
+    qualified = activation.merge(
+        funded[["address", "activation_date"]],
         on=["address", "activation_date"],
-        how="left",
+        how="inner",
     )
-    scoped["funded_d0"] = scoped["funded_d0"].fillna(False)
-    scoped["has_snapshot"] = scoped["has_snapshot"].fillna(False)
-    qualified = scoped[(scoped["funded_d0"]) & (scoped["has_snapshot"])]
     if qualified.empty:
         panel = pd.DataFrame(columns=columns)
         if persist:
@@ -1053,44 +1616,16 @@ def compute_segmented_retention_panel(
     )
     qualified["value_30d"] = qualified["value_30d"].fillna(False)
 
-    membership_frames: list[pd.DataFrame] = [
-        qualified[["address", "first_seen", "activation_date"]].assign(segment="All")
-    ]
-    value_subset = qualified[qualified["value_30d"]]
-    if not value_subset.empty:
-        membership_frames.append(
-            value_subset[["address", "first_seen", "activation_date"]].assign(segment="Value")
-        )
-    non_value_subset = qualified[~qualified["value_30d"]]
-    if not non_value_subset.empty:
-        membership_frames.append(
-            non_value_subset[["address", "first_seen", "activation_date"]].assign(
-                segment="Non-value"
-            )
-        )
-    membership = pd.concat(membership_frames, ignore_index=True)
-    if membership.empty:
-        panel = pd.DataFrame(columns=columns)
-        if persist:
-            _persist_retention_segmented(
-                panel,
-                output_path=target_path,
-                db_path=db_path,
-                persist_db=persist_db,
-            )
-        return panel
-
-    membership["activation_date"] = membership["activation_date"].dt.floor("D")
-    membership["first_seen"] = pd.to_datetime(membership["first_seen"], utc=True)
-    membership["address"] = membership["address"].astype(str)
-    membership = membership.drop_duplicates(subset=["address", "segment"])
-
-    segment_activity = activity.merge(
-        membership[["address", "segment", "activation_date", "first_seen"]],
-        on="address",
-        how="inner",
+    # One membership row per wallet with a segment bitmap: every wallet is in
+    # "All" and in exactly one of Value / Non-value, so activity is joined and
+    # folded once rather than once per segment.
+    members = qualified[["address", "activation_date", "value_30d"]].drop_duplicates(
+        subset="address"
     )
-    if segment_activity.empty:
+    members = members.assign(value_30d=members["value_30d"].astype(bool))
+
+    address_days = _fold_segment_activity(members, activity)
+    if address_days.empty:
         panel = pd.DataFrame(columns=columns)
         if persist:
             _persist_retention_segmented(
@@ -1101,18 +1636,6 @@ def compute_segmented_retention_panel(
             )
         return panel
 
-    segment_activity["days_since_activation"] = (
-        segment_activity["activity_date"] - segment_activity["activation_date"]
-    ).dt.days
-    segment_activity = segment_activity[segment_activity["days_since_activation"] >= 0]
-
-    last_activity = (
-        segment_activity.groupby(["segment", "activation_date", "address"])["days_since_activation"]
-        .max()
-        .rename("last_active_days")
-        .reset_index()
-    )
-
     windows = sorted(set(int(w) for w in windows if int(w) > 0))
     if not windows:
         panel = pd.DataFrame(columns=columns)
@@ -1134,11 +1657,19 @@ def compute_segmented_retention_panel(
             else pd.Timestamp(today).tz_localize("UTC").floor("D")
         )
 
-    cohort_sizes = (
-        membership.groupby(["segment", "activation_date"])["address"]
-        .nunique()
-        .rename("cohort_size")
-    )
+    segment_members = {
+        "All": members,
+        "Value": members[members["value_30d"]],
+        "Non-value": members[~members["value_30d"]],
+    }
+    cohort_sizes = pd.concat(
+        {
+            segment: frame.groupby("activation_date").size()
+            for segment, frame in segment_members.items()
+            if not frame.empty
+        },
+        names=["segment", "activation_date"],
+    ).rename("cohort_size")
     if cohort_sizes.empty:
         panel = pd.DataFrame(columns=columns)
         if persist:
@@ -1150,21 +1681,11 @@ def compute_segmented_retention_panel(
             )
         return panel
 
-    anchor_window: int | None = None
-    maturity_anchor: pd.Timestamp | None = None
-    eligible_anchor: pd.Series | None = None
-    for candidate in sorted(windows, reverse=True):
-        maturity_cutoff = today - pd.Timedelta(days=candidate)
-        eligible = cohort_sizes[
-            cohort_sizes.index.get_level_values("activation_date") <= maturity_cutoff
-        ]
-        if eligible.empty:
-            continue
-        anchor_window = candidate
-        maturity_anchor = maturity_cutoff
-        eligible_anchor = eligible
-        break
-    if anchor_window is None or eligible_anchor is None or maturity_anchor is None:
+    # The anchor is the longest window the oldest cohort has matured for.
+    cohort_dates = cohort_sizes.index.get_level_values("activation_date")
+    oldest_age = (today - cohort_dates.min()) // pd.Timedelta(days=1)
+    mature = int(np.searchsorted(windows, oldest_age, side="right"))
+    if not mature:
         panel = pd.DataFrame(columns=columns)
         if persist:
             _persist_retention_segmented(
@@ -1175,92 +1696,73 @@ def compute_segmented_retention_panel(
             )
         return panel
 
-    usable_windows = [w for w in windows if w <= anchor_window]
-    if not usable_windows:
-        panel = pd.DataFrame(columns=columns)
-        if persist:
-            _persist_retention_segmented(
-                panel,
-                output_path=target_path,
-                db_path=db_path,
-                persist_db=persist_db,
-            )
-        return panel
+    anchor_window = windows[mature - 1]
+    maturity_anchor = today - pd.Timedelta(days=anchor_window)
+    eligible_anchor = cohort_sizes[cohort_dates <= maturity_anchor]
+
+    usable_windows = windows[:mature]
 
     eligible_totals = eligible_anchor.reset_index().groupby("segment")["cohort_size"].sum()
-    segments = sorted(eligible_totals.index.tolist())
 
-    results: list[dict[str, object]] = []
-    for window in usable_windows:
-        if mode == "cumulative":
-            engaged = (
-                segment_activity[
-                    (segment_activity["days_since_activation"] > 0)
-                    & (segment_activity["days_since_activation"] <= window)
-                ]
-                .drop_duplicates(subset=["segment", "activation_date", "address"])
-                .groupby(["segment", "activation_date"])["address"]
-                .nunique()
-                .rename("retained_users")
-            )
-        else:
-            survival_subset = last_activity[last_activity["last_active_days"] >= window]
-            engaged = (
-                survival_subset.groupby(["segment", "activation_date"])["address"]
-                .nunique()
-                .rename("retained_users")
-            )
-        if not engaged.empty:
-            engaged = engaged[
-                engaged.index.get_level_values("activation_date") <= maturity_anchor
-            ]
-        retained_totals = (
-            engaged.reset_index().groupby("segment")["retained_users"].sum()
-            if not engaged.empty
-            else pd.Series(dtype=float)
+    matured = address_days[address_days["activation_date"] <= maturity_anchor]
+    counter = "first_return_days" if mode == "cumulative" else "last_active_days"
+    days = matured[counter].fillna(-1).to_numpy(dtype="int64")
+    # Expand the bitmap into segment codes: 0 = All, 1 = Value, 2 = Non-value.
+    segment_codes = np.concatenate(
+        [
+            np.zeros(len(matured), dtype="int64"),
+            np.where(matured["value_30d"].to_numpy(dtype=bool), 1, 2),
+        ]
+    )
+    retained_counts = pd.DataFrame(
+        _retained_by_window(
+            segment_codes,
+            np.concatenate([days, days]),
+            len(segment_members),
+            usable_windows,
+            mode=mode,
+        ),
+        index=list(segment_members),
+        columns=usable_windows,
+    )
+
+    eligible = eligible_totals[eligible_totals > 0].sort_index()
+    if eligible.empty:
+        panel = pd.DataFrame(columns=columns)
+    else:
+        retained_matrix = retained_counts.reindex(eligible.index, fill_value=0).to_numpy()
+        n_segments = len(eligible)
+        updated_at = pd.Timestamp(_utc_now()).tz_convert("UTC")
+        panel = pd.DataFrame(
+            {
+                "window_days": np.repeat(usable_windows, n_segments),
+                "segment": pd.Categorical(
+                    np.tile(eligible.index.to_numpy(), len(usable_windows)),
+                    dtype=SEGMENT_DTYPE,
+                ),
+                "retained_users": retained_matrix.T.ravel(),
+                "eligible_users": np.tile(eligible.to_numpy(), len(usable_windows)),
+            }
         )
-        for segment in segments:
-            eligible_total = int(eligible_totals.get(segment, 0))
-            if eligible_total == 0:
-                continue
-            retained_total = int(retained_totals.get(segment, 0))
-            pct = retained_total / eligible_total * 100 if eligible_total else 0.0
-            results.append(
+        panel["retention_pct"] = panel["retained_users"] / panel["eligible_users"] * 100
+        panel["anchor_window_days"] = int(anchor_window)
+        panel["updated_at"] = updated_at
+        if mode == "cumulative":
+            zero_rows = pd.DataFrame(
                 {
-                    "window_days": int(window),
-                    "segment": segment,
-                    "retained_users": retained_total,
-                    "eligible_users": eligible_total,
-                    "retention_pct": pct,
+                    "window_days": 0,
+                    "segment": pd.Categorical(
+                        eligible.index.to_numpy(), dtype=SEGMENT_DTYPE
+                    ),
+                    "retained_users": 0,
+                    "eligible_users": eligible.to_numpy(),
+                    "retention_pct": 0.0,
                     "anchor_window_days": int(anchor_window),
-                    "updated_at": pd.Timestamp(_utc_now()).tz_convert("UTC"),
+                    "updated_at": updated_at,
                 }
             )
-
-    panel = pd.DataFrame(results, columns=columns) if results else pd.DataFrame(columns=columns)
-    if not panel.empty:
-        panel = panel[columns]
-        if mode == "cumulative":
-            zero_rows: list[dict[str, object]] = []
-            updated_at = pd.Timestamp(_utc_now()).tz_convert("UTC")
-            for segment in segments:
-                eligible_total = int(eligible_totals.get(segment, 0))
-                if eligible_total <= 0:
-                    continue
-                zero_rows.append(
-                    {
-                        "window_days": 0,
-                        "segment": segment,
-                        "retained_users": 0,
-                        "eligible_users": eligible_total,
-                        "retention_pct": 0.0,
-                        "anchor_window_days": int(anchor_window),
-                        "updated_at": updated_at,
-                    }
-                )
-            if zero_rows:
-                panel = pd.concat([pd.DataFrame(zero_rows), panel], ignore_index=True)
-                panel = panel.sort_values(["segment", "window_days"])
+            panel = pd.concat([zero_rows, panel], ignore_index=True)
+            panel = panel.sort_values(["segment", "window_days"])
     if persist:
         _persist_retention_segmented(
             panel,
@@ -1277,14 +1779,13 @@ def compute_new_wallets(
     if first_seen.empty:
         return pd.DataFrame(columns=["activation_date", "new_wallets"])
 
-    data = first_seen[first_seen["first_seen"] >= start_ts].copy()
+    data = first_seen[first_seen["first_seen"] >= start_ts]
     if data.empty:
         return pd.DataFrame(columns=["activation_date", "new_wallets"])
 
-    data["activation_date"] = data["first_seen"].dt.floor("D")
+    data = data.assign(activation_date=data["first_seen"].dt.floor("D"))
     summary = (
-        data.groupby("activation_date")["address"]
-        .nunique()
+        _distinct_count(data, "activation_date", "address")
         .rename("new_wallets")
         .reset_index()
         .sort_values("activation_date")
@@ -1292,6 +1793,18 @@ def compute_new_wallets(
     return summary
 
 
+def _trailing_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of the last ``window`` rows (``rolling(window, min_periods=1).mean()``).
+
+    Uses one cumulative sum and a difference per row instead of pandas'
+    generic rolling machinery.
+    """
+    totals = np.concatenate(([0], np.cumsum(values, dtype="float64")))
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window, 0)
+    return (totals[upper] - totals[lower]) / (upper - lower)
+
+
 def compute_active_wallets(
     activity: pd.DataFrame, start_ts: pd.Timestamp
 ) -> pd.DataFrame:
@@ -1300,25 +1813,21 @@ def compute_active_wallets(
             columns=["activity_date", "active_wallets", "rolling_7d", "rolling_30d"]
         )
 
-    data = activity[activity["block_time"] >= start_ts].copy()
+    data = activity[activity["block_time"] >= start_ts]
     if data.empty:
         return pd.DataFrame(
             columns=["activity_date", "active_wallets", "rolling_7d", "rolling_30d"]
         )
 
     summary = (
-        data.groupby("activity_date")["address"]
-        .nunique()
+        _distinct_count(data, "activity_date", "address")
         .rename("active_wallets")
         .reset_index()
         .sort_values("activity_date")
     )
-    summary["rolling_7d"] = (
-        summary["active_wallets"].rolling(window=7, min_periods=1).mean()
-    )
-    summary["rolling_30d"] = (
-        summary["active_wallets"].rolling(window=30, min_periods=1).mean()
-    )
+    active = summary["active_wallets"].to_numpy()
+    summary["rolling_7d"] = _trailing_mean(active, 7)
+    summary["rolling_30d"] = _trailing_mean(active, 30)
     return summary
 
 
@@ -1333,6 +1842,125 @@ def _resolve_retention_band(window: int, band_days: Mapping[int, int] | None) ->
     return min(window, band)
 
 
+def _retained_by_cohort(
+    cohort_codes: np.ndarray,
+    address_codes: np.ndarray,
+    days: np.ndarray,
+    *,
+    n_cohorts: int,
+    n_addresses: int,
+    windows: Sequence[int],
+    lowers: Sequence[int],
+) -> np.ndarray:
+    """Count distinct wallets per (cohort, window) active in ``(lower, window]``.
+
+    All windows are resolved in a single pass: each activity row is matched
+    against every window band, and the (cohort, wallet, window) hits are
+    deduplicated once before counting.
+    """
+    n_windows = len(windows)
+    upper = np.asarray(windows, dtype="int64")
+    lower = np.asarray(lowers, dtype="int64")
+    hits = (days[:, None] > lower) & (days[:, None] <= upper)
+    rows, window_index = np.nonzero(hits)
+    keys = (
+        cohort_codes[rows].astype("int64") * n_addresses + address_codes[rows]
+    ) * n_windows + window_index
+    # Sort-based dedupe; np.unique's hash path is several times slower here.
+    keys.sort()
+    if keys.size:
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+    cells = (keys // (n_addresses * n_windows)) * n_windows + keys % n_windows
+    return np.bincount(cells, minlength=n_cohorts * n_windows).reshape(
+        n_cohorts, n_windows
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class _RetentionOffsets:
+    """Activity rows on or after activation, as (cohort, wallet, day) codes."""
+
+    cohort_codes: np.ndarray
+    address_codes: np.ndarray
+    days: np.ndarray
+    n_cohorts: int
+    n_addresses: int
+    has_cohort: np.ndarray  # cohorts with a non-zero day-0 size
+    cohort_sizes: pd.Series
+
+
+# One-slot memo for _retention_offsets: dashboards compute the cumulative and
+# active-band panels from the same activity and first_seen frames.
+_RETENTION_OFFSETS_MEMO: tuple[tuple[Any, ...], _RetentionOffsets | None] | None = None
+
+
+def _retention_offsets(
+    activity: pd.DataFrame, first_seen: pd.DataFrame
+) -> _RetentionOffsets | None:
+    """Join activity to activation cohorts; ``None`` when nothing follows activation.
+
+    Reuses the last result when both frames hash to the same content. The
+    returned arrays are shared between callers and are marked read-only.
+    """
+    global _RETENTION_OFFSETS_MEMO
+    fingerprint = (
+        len(first_seen),
+        _content_hash(first_seen, ["address", "first_seen"]),
+        _activity_fingerprint(activity),
+    )
+    memo = _RETENTION_OFFSETS_MEMO
+    if memo is not None and memo[0] == fingerprint:
+        return memo[1]
+
+    first_seen_ts = pd.to_datetime(first_seen["first_seen"], utc=True)
+    in_coverage = (first_seen_ts >= METRICS_DATA_START).to_numpy()
+    # Join through the first-seen positions instead of ``merge``: the
+    # position doubles as the wallet code and its activation day as the
+    # cohort code, so the address strings are hashed only once.
+    cohort_addresses = pd.Index(first_seen["address"].to_numpy()[in_coverage])
+    positions = cohort_addresses.get_indexer(activity["address"])
+    matched = positions >= 0
+    activation = first_seen_ts[in_coverage].dt.floor("D")
+    cohort_of_wallet, cohort_labels = pd.factorize(activation, sort=True)
+    positions = positions[matched]
+    days_since_activation = (
+        _epoch_ns(activity["activity_date"])[matched]
+        - _epoch_ns(activation)[positions]
+    ) // NS_PER_DAY
+    after_activation = days_since_activation >= 0
+    positions = positions[after_activation]
+    days_since_activation = days_since_activation[after_activation]
+
+    offsets = None
+    if len(positions):
+        active_on_day0 = np.zeros(len(cohort_addresses), dtype=bool)
+        active_on_day0[positions[days_since_activation == 0]] = True
+        cohort_counts = np.bincount(
+            cohort_of_wallet[active_on_day0], minlength=len(cohort_labels)
+        )
+        has_cohort = cohort_counts > 0
+        cohort_codes = cohort_of_wallet[positions]
+        sizes = cohort_counts[has_cohort]
+        # The memo hands these to every caller; refuse in-place edits.
+        for array in (cohort_codes, positions, days_since_activation, has_cohort, sizes):
+            array.setflags(write=False)
+        offsets = _RetentionOffsets(
+            cohort_codes=cohort_codes,
+            address_codes=positions,
+            days=days_since_activation,
+            n_cohorts=len(cohort_labels),
+            n_addresses=len(cohort_addresses),
+            has_cohort=has_cohort,
+            cohort_sizes=pd.Series(
+                sizes,
+                index=cohort_labels[has_cohort],
+                name="cohort_size",
+            ),
+        )
+    _RETENTION_OFFSETS_MEMO = (fingerprint, offsets)
+    return offsets
+
+
 def compute_retention(
     activity: pd.DataFrame,
     first_seen: pd.DataFrame,
@@ -1378,14 +2006,8 @@ def compute_retention(
             ]
         )
 
-    sanitized_first_seen = first_seen.copy()
-    sanitized_first_seen["first_seen"] = pd.to_datetime(
-        sanitized_first_seen["first_seen"], utc=True
-    )
-    sanitized_first_seen = sanitized_first_seen[
-        sanitized_first_seen["first_seen"] >= METRICS_DATA_START
-    ]
-    if sanitized_first_seen.empty:
+    offsets = _retention_offsets(activity, first_seen)
+    if offsets is None:
         return pd.DataFrame(
             columns=[
                 "activation_date",
@@ -1395,42 +2017,7 @@ def compute_retention(
                 "retention_rate",
             ]
         )
-
-    merged = activity.merge(sanitized_first_seen, on="address", how="left")
-    merged = merged.dropna(subset=["first_seen"])
-    if merged.empty:
-        return pd.DataFrame(
-            columns=[
-                "activation_date",
-                "window_days",
-                "cohort_size",
-                "retained_wallets",
-                "retention_rate",
-            ]
-        )
-
-    merged["activation_date"] = merged["first_seen"].dt.floor("D")
-    merged["days_since_activation"] = (
-        merged["activity_date"] - merged["activation_date"]
-    ).dt.days
-    merged = merged[merged["days_since_activation"] >= 0]
-    if merged.empty:
-        return pd.DataFrame(
-            columns=[
-                "activation_date",
-                "window_days",
-                "cohort_size",
-                "retained_wallets",
-                "retention_rate",
-            ]
-        )
-
-    cohort_sizes = (
-        merged[merged["days_since_activation"] == 0]
-        .groupby("activation_date")["address"]
-        .nunique()
-        .rename("cohort_size")
-    )
+    cohort_sizes = offsets.cohort_sizes
 
     if today is None:
         today = pd.Timestamp(_utc_now()).floor("D")
@@ -1445,46 +2032,31 @@ def compute_retention(
     if mode not in {"cumulative", "active_band"}:
         raise ValueError("mode must be 'cumulative' or 'active_band'")
 
-    results: list[dict[str, object]] = []
-    for window in windows:
-        eligible_dates = cohort_sizes.index[
-            cohort_sizes.index <= today - pd.Timedelta(days=window)
+    if mode == "cumulative":
+        lowers = [0] * len(windows)
+    else:
+        lowers = [
+            max(window - _resolve_retention_band(window, band_days), 0)
+            for window in windows
         ]
-        if eligible_dates.empty:
-            continue
-
-        if mode == "cumulative":
-            lower = 0
-        else:
-            band = _resolve_retention_band(window, band_days)
-            lower = max(window - band, 0)
-
-        engaged_mask = (merged["days_since_activation"] > lower) & (
-            merged["days_since_activation"] <= window
-        )
-        engaged = (
-            merged[engaged_mask]
-            .drop_duplicates(subset=["activation_date", "address"])
-            .groupby("activation_date")["address"]
-            .nunique()
-            .rename("retained_wallets")
-        )
-
-        for activation_date in eligible_dates:
-            cohort_size = int(cohort_sizes.loc[activation_date])
-            retained = int(engaged.get(activation_date, 0))
-            rate = retained / cohort_size if cohort_size else 0.0
-            results.append(
-                {
-                    "activation_date": activation_date,
-                    "window_days": window,
-                    "cohort_size": cohort_size,
-                    "retained_wallets": retained,
-                    "retention_rate": rate,
-                }
-            )
-
-    if not results:
+    # Rows follow cohort codes, so the cohorts with a day-0 size are picked
+    # by mask instead of a label reindex.
+    retained_matrix = _retained_by_cohort(
+        offsets.cohort_codes,
+        offsets.address_codes,
+        offsets.days,
+        n_cohorts=offsets.n_cohorts,
+        n_addresses=offsets.n_addresses,
+        windows=windows,
+        lowers=lowers,
+    )[offsets.has_cohort]
+
+    cohort_dates = cohort_sizes.index
+    cutoffs = pd.DatetimeIndex([today - pd.Timedelta(days=window) for window in windows])
+    window_index, cohort_index = np.nonzero(
+        cohort_dates.values[None, :] <= cutoffs.values[:, None]
+    )
+    if not len(window_index):
         return pd.DataFrame(
             columns=[
                 "activation_date",
@@ -1495,7 +2067,16 @@ def compute_retention(
             ]
         )
 
-    return pd.DataFrame(results).sort_values(["window_days", "activation_date"])
+    result = pd.DataFrame(
+        {
+            "activation_date": cohort_dates[cohort_index],
+            "window_days": np.asarray(windows)[window_index],
+            "cohort_size": cohort_sizes.to_numpy()[cohort_index],
+            "retained_wallets": retained_matrix[cohort_index, window_index],
+        }
+    )
+    result["retention_rate"] = result["retained_wallets"] / result["cohort_size"]
+    return result.sort_values(["window_days", "activation_date"])
 
 
 def compute_fee_per_wallet(
@@ -1528,9 +2109,8 @@ def compute_fee_per_wallet(
             ]
         )
 
-    merged = activity.merge(first_seen, on="address", how="left")
-    merged = merged.dropna(subset=["first_seen"])
-    if merged.empty:
+    cohorts = first_seen[["address", "first_seen"]].dropna(subset=["first_seen"])
+    if cohorts.empty:
         return pd.DataFrame(
             columns=[
                 "activation_date",
@@ -1540,12 +2120,7 @@ def compute_fee_per_wallet(
                 "wallets_observed",
             ]
         )
-
-    merged["activation_date"] = merged["first_seen"].dt.floor("D")
-    merged["days_since_activation"] = (
-        merged["activity_date"] - merged["activation_date"]
-    ).dt.days
-    merged = merged[merged["days_since_activation"] >= 0]
+    cohorts = cohorts.assign(activation_date=cohorts["first_seen"].dt.floor("D"))
 
     if today is None:
         today = pd.Timestamp(_utc_now()).floor("D")
@@ -1556,45 +2131,58 @@ def compute_fee_per_wallet(
             else pd.Timestamp(today).tz_localize("UTC").floor("D")
         )
 
-    results: list[dict[str, object]] = []
-    for window in windows:
-        eligible_mask = merged["activation_date"] <= today - pd.Timedelta(days=window)
-        eligible = merged[eligible_mask]
-        if eligible.empty:
-            continue
-
-        window_activity = eligible[
-            (eligible["days_since_activation"] >= 0)
-            & (eligible["days_since_activation"] < window)
-        ]
-        if window_activity.empty:
-            continue
-
-        wallet_fee = (
-            window_activity.groupby(["activation_date", "address"])["fee_ustx"]
-            .sum()
-            .reset_index()
+    # One DuckDB pass: join activity to cohorts, fan each row out to the
+    # windows it falls in (and whose cohorts have matured), sum per wallet,
+    # then summarise per cohort. Day offsets use epoch arithmetic so the
+    # session time zone never matters.
+    with scratch_connection() as conn:
+        conn.register("fee_activity", activity[["address", "activity_date", "fee_ustx"]])
+        conn.register("fee_cohorts", cohorts[["address", "activation_date"]])
+        conn.register(
+            "fee_windows", pa.table({"window_days": pa.array(windows, pa.int64())})
         )
-        wallet_fee["fee_stx"] = wallet_fee["fee_ustx"] / MICROSTX_PER_STX
-
-        aggregated = wallet_fee.groupby("activation_date")["fee_stx"].agg(
-            avg_fee_stx="mean",
-            median_fee_stx="median",
-            wallets_observed="count",
-        )
-
-        for activation_date, row in aggregated.iterrows():
-            results.append(
-                {
-                    "activation_date": activation_date,
-                    "window_days": window,
-                    "avg_fee_stx": float(row["avg_fee_stx"]),
-                    "median_fee_stx": float(row["median_fee_stx"]),
-                    "wallets_observed": int(row["wallets_observed"]),
-                }
+        result = conn.execute(
+            f"""
+            WITH joined AS (
+                SELECT
+                    c.activation_date,
+                    a.address,
+                    a.fee_ustx,
+                    CAST(
+                        floor(
+                            (epoch_us(a.activity_date) - epoch_us(c.activation_date))
+                            / 86400000000.0
+                        ) AS BIGINT
+                    ) AS days_since_activation
+                FROM fee_activity AS a
+                JOIN fee_cohorts AS c USING (address)
+            ),
+            wallet_fee AS (
+                SELECT
+                    w.window_days,
+                    j.activation_date,
+                    j.address,
+                    COALESCE(SUM(j.fee_ustx), 0) / {MICROSTX_PER_STX} AS fee_stx
+                FROM joined AS j
+                JOIN fee_windows AS w
+                  ON j.days_since_activation >= 0
+                 AND j.days_since_activation < w.window_days
+                WHERE epoch_us(j.activation_date) <= ? - w.window_days * 86400000000
+                GROUP BY w.window_days, j.activation_date, j.address
             )
-
-    if not results:
+            SELECT
+                epoch_us(activation_date) AS activation_us,
+                window_days,
+                AVG(fee_stx) AS avg_fee_stx,
+                quantile_cont(fee_stx, 0.5) AS median_fee_stx,
+                COUNT(*) AS wallets_observed
+            FROM wallet_fee
+            GROUP BY activation_date, window_days
+            ORDER BY window_days, activation_date
+            """,
+            [today.value // 1_000],
+        ).fetchdf()
+    if result.empty:
         return pd.DataFrame(
             columns=[
                 "activation_date",
@@ -1604,8 +2192,12 @@ def compute_fee_per_wallet(
                 "wallets_observed",
             ]
         )
-
-    return pd.DataFrame(results).sort_values(["window_days", "activation_date"])
+    result.insert(
+        0,
+        "activation_date",
+        pd.to_datetime(result.pop("activation_us"), unit="us", utc=True),
+    )
+    return result
 def load_retention_segmented() -> pd.DataFrame:
     cached = read_parquet(SEGMENTED_RETENTION_PATH)
     if cached is None:
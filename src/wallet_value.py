@@ -22,6 +22,7 @@ from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Iterable, Mapping, Sequence
 
+import numpy as np
 import pandas as pd
 
 from . import prices
@@ -51,6 +52,13 @@ def _as_utc(ts: datetime) -> datetime:
     return ts.astimezone(UTC)
 
 
+def _as_utc_series(values: pd.Series) -> pd.Series:
+    """Parse ``values`` as UTC timestamps, passing UTC columns through as-is."""
+    if isinstance(values.dtype, pd.DatetimeTZDtype) and str(values.dt.tz) == "UTC":
+        return values
+    return pd.to_datetime(values, utc=True)
+
+
 def _ensure_ns_timestamp(series: pd.Series) -> pd.Series:
     """Coerce datetime64 series to timezone-aware nanosecond resolution."""
     if not pd.api.types.is_datetime64_any_dtype(series):
@@ -76,6 +84,12 @@ def compute_activation(first_seen: pd.DataFrame) -> pd.DataFrame:
     return df[["address", "activation_time", "activation_date"]]
 
 
+# Price panels keyed by (start, end, frequency): the dashboard builders price
+# the same activity range several times per process.
+_PRICE_PANEL_MEMO: dict[tuple[datetime, datetime, str], pd.DataFrame] = {}
+_PRICE_PANEL_MEMO_SIZE = 16
+
+
 def load_price_panel_for_activity(
     activity: pd.DataFrame, *, frequency: str = "1h", force_refresh: bool = False
 ) -> pd.DataFrame:
@@ -88,11 +102,36 @@ def load_price_panel_for_activity(
     end = _as_utc(pd.to_datetime(activity["block_time"].max(), utc=True)) + timedelta(
         days=1
     )
-    panel = prices.load_price_panel(
-        start, end, frequency=frequency, force_refresh=force_refresh
+    key = (start, end, frequency)
+    panel = None if force_refresh else _PRICE_PANEL_MEMO.get(key)
+    if panel is None:
+        panel = prices.load_price_panel(
+            start, end, frequency=frequency, force_refresh=force_refresh
+        )
+        panel["ts"] = pd.to_datetime(panel["ts"], utc=True)
+        panel = panel[["ts", "stx_btc"]]
+        _PRICE_PANEL_MEMO.pop(key, None)
+        if len(_PRICE_PANEL_MEMO) >= _PRICE_PANEL_MEMO_SIZE:
+            _PRICE_PANEL_MEMO.pop(next(iter(_PRICE_PANEL_MEMO)))
+        _PRICE_PANEL_MEMO[key] = panel
+    return panel.copy()
+
+
+def _nearest_rows(targets: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Row in sorted ``keys`` nearest to each target (``merge_asof`` "nearest").
+
+    Ties go to the earlier key, and to the last of duplicate keys, as in
+    pandas.
+    """
+    before = np.searchsorted(keys, targets, side="right") - 1
+    after = np.searchsorted(keys, targets, side="left")
+    before_clipped = np.maximum(before, 0)
+    after_clipped = np.minimum(after, len(keys) - 1)
+    take_before = (before >= 0) & (
+        (after >= len(keys))
+        | (targets - keys[before_clipped] <= keys[after_clipped] - targets)
     )
-    panel["ts"] = pd.to_datetime(panel["ts"], utc=True)
-    return panel[["ts", "stx_btc"]]
+    return np.where(take_before, before_clipped, after_clipped)
 
 
 def _enrich_activity_with_prices(
@@ -100,27 +139,30 @@ def _enrich_activity_with_prices(
 ) -> pd.DataFrame:
     if activity.empty:
         return activity.copy()
-    df = activity.copy()
-    df["block_time"] = _ensure_ns_timestamp(df["block_time"])
-    price_panel = price_panel.copy()
-    if "stx_btc" not in price_panel.columns:
-        if {"stx_usd", "btc_usd"}.issubset(price_panel.columns):
-            price_panel["stx_btc"] = price_panel["stx_usd"].astype(float) / price_panel[
+    df = activity.assign(
+        block_time=_ensure_ns_timestamp(activity["block_time"])
+    ).sort_values("block_time", ignore_index=True)
+    panel = price_panel.assign(ts=_ensure_ns_timestamp(price_panel["ts"]))
+    if "stx_btc" not in panel.columns:
+        if {"stx_usd", "btc_usd"}.issubset(panel.columns):
+            panel["stx_btc"] = panel["stx_usd"].astype(float) / panel[
                 "btc_usd"
             ].astype(float)
         else:
-            price_panel["stx_btc"] = pd.NA
-    price_panel["ts"] = _ensure_ns_timestamp(price_panel["ts"])
-    df = pd.merge_asof(
-        df.sort_values("block_time"),
-        price_panel.sort_values("ts"),
-        left_on="block_time",
-        right_on="ts",
-        direction="nearest",
-    )
-    df = df.drop(columns=["ts"]) if "ts" in df else df
-    if "stx_btc" not in df.columns:
-        df["stx_btc"] = 0.0
+            panel["stx_btc"] = pd.NA
+    if not panel["ts"].is_monotonic_increasing:
+        panel = panel.sort_values("ts")
+    # Nearest-price lookup on the int64 epochs instead of merge_asof.
+    price_columns = [column for column in panel.columns if column != "ts"]
+    if len(panel):
+        nearest = _nearest_rows(
+            df["block_time"].values.view("int64"), panel["ts"].values.view("int64")
+        )
+        for column in price_columns:
+            df[column] = panel[column].to_numpy()[nearest]
+    else:
+        for column in price_columns:
+            df[column] = np.nan
     df["fee_stx"] = df["fee_ustx"].astype(float) / MICROSTX_PER_STX
     # If price is missing, NV contribution is unknown; treat as 0 and flag could be added
     df["stx_btc"] = df["stx_btc"].astype(float)
@@ -155,6 +197,9 @@ def compute_wallet_windows(
       - nv_btc_sum
       - band_tx_count (transactions inside the trailing activity band)
       - active_in_window (bool indicating >=1 tx in the trailing band)
+
+    ``activity`` may already be enriched (it carries ``nv_btc``), in which
+    case ``price_panel`` is not consulted again.
     """
     if activity.empty or first_seen.empty:
         return pd.DataFrame(
@@ -169,30 +214,6 @@ def compute_wallet_windows(
                 "active_in_window",
             ]
         )
-    enriched = _enrich_activity_with_prices(activity, price_panel)
-    activation = compute_activation(first_seen)
-    merged = enriched.merge(activation, on="address", how="left")
-    merged = merged.dropna(subset=["activation_time"])  # ensure known start
-    merged["days_since_activation"] = (
-        merged["block_time"] - merged["activation_time"]
-    ).dt.total_seconds() / 86400.0
-    merged = merged[merged["days_since_activation"] >= 0]
-    if merged.empty:
-        return pd.DataFrame(
-            columns=[
-                "address",
-                "activation_date",
-                "window_days",
-                "tx_count",
-                "fee_stx_sum",
-                "nv_btc_sum",
-                "band_tx_count",
-                "active_in_window",
-            ]
-        )
-
-    band_lookup = {int(w): _resolve_window_band(int(w), band_days) for w in windows}
-
     window_values = sorted(set(int(x) for x in windows if int(x) > 0))
     if not window_values:
         return pd.DataFrame(
@@ -207,52 +228,42 @@ def compute_wallet_windows(
                 "active_in_window",
             ]
         )
-
-    band_lookup = {w: _resolve_window_band(w, band_days) for w in window_values}
-
-    results: list[pd.DataFrame] = []
-    for w in window_values:
-        window_slice = merged[merged["days_since_activation"] < w]
-        if window_slice.empty:
-            continue
-        band = band_lookup.get(w, _resolve_window_band(w, band_days))
-        band_lower = max(w - band, 0)
-        band_slice = window_slice[
-            (window_slice["days_since_activation"] >= band_lower)
-            & (window_slice["days_since_activation"] < w)
-        ]
-        agg = (
-            window_slice.groupby(["address", "activation_date"])[
-                ["tx_id", "fee_stx", "nv_btc"]
-            ]
-            .agg(
-                tx_count=("tx_id", "count"),
-                fee_stx_sum=("fee_stx", "sum"),
-                nv_btc_sum=("nv_btc", "sum"),
-            )
-            .reset_index()
-        )
-        agg["window_days"] = w
-        if not band_slice.empty:
-            band_counts = (
-                band_slice.groupby(["address", "activation_date"])["tx_id"]
-                .count()
-                .rename("band_tx_count")
-                .reset_index()
-            )
-        else:
-            band_counts = pd.DataFrame(
-                columns=["address", "activation_date", "band_tx_count"]
-            )
-        agg = agg.merge(
-            band_counts,
-            on=["address", "activation_date"],
-            how="left",
-        )
-        agg["band_tx_count"] = agg["band_tx_count"].fillna(0).astype(int)
-        agg["active_in_window"] = agg["band_tx_count"] > 0
-        results.append(agg)
-    if not results:
+    band_lowers = [
+        max(w - _resolve_window_band(w, band_days), 0) for w in window_values
+    ]
+
+    enriched = (
+        activity
+        if "nv_btc" in activity.columns
+        else _enrich_activity_with_prices(activity, price_panel)
+    )
+    # One activation row per address (the first, should first_seen repeat an
+    # address), so each transaction maps to its activation row by position
+    # instead of a merge. Positions are ranked in (address, activation_date)
+    # order to match the groupby output order.
+    activation = (
+        compute_activation(first_seen)
+        .drop_duplicates("address", keep="first")
+        .reset_index(drop=True)
+    )
+    positions = pd.Index(activation["address"]).get_indexer(enriched["address"])
+    order = activation.sort_values(["address", "activation_date"], kind="stable").index
+    rank = np.empty(len(activation), dtype="int64")
+    rank[order.to_numpy()] = np.arange(len(activation))
+    matched = positions >= 0
+    matched[matched] = activation["activation_time"].notna().to_numpy()[
+        positions[matched]
+    ]
+    # Whole elapsed days: windows and bands are whole days, so comparing the
+    # floored value gives the same answer as the fractional one.
+    days_since_activation = (
+        enriched["block_time"].values[matched]
+        - activation["activation_time"].values[positions[matched]]
+    ) // np.timedelta64(1, "D")
+    in_windows = (days_since_activation >= 0) & (
+        days_since_activation < window_values[-1]
+    )
+    if not in_windows.any():
         return pd.DataFrame(
             columns=[
                 "address",
@@ -265,13 +276,56 @@ def compute_wallet_windows(
                 "active_in_window",
             ]
         )
-    out = pd.concat(results, ignore_index=True)
-    # Ensure types
-    out["tx_count"] = out["tx_count"].astype(int)
-    out["fee_stx_sum"] = out["fee_stx_sum"].astype(float)
-    out["nv_btc_sum"] = out["nv_btc_sum"].astype(float)
-    out["window_days"] = out["window_days"].astype(int)
-    return out
+    rows = np.flatnonzero(matched)[in_windows]
+    days_since_activation = days_since_activation[in_windows]
+    group_codes, group_ranks = pd.factorize(rank[positions[rows]], sort=True)
+    wallet_rows = order.to_numpy()[group_ranks]
+
+    # One pass for every window: each row is bucketed by the window and band
+    # thresholds it falls below, and per-wallet cumulative sums over the
+    # buckets give "rows with days_since_activation < threshold" for all of
+    # them at once.
+    thresholds = np.unique(np.asarray(window_values + band_lowers, dtype="int64"))
+    n_buckets = len(thresholds) + 1
+    cells = group_codes * n_buckets + np.searchsorted(
+        thresholds, days_since_activation, side="right"
+    )
+
+    def below(weights: np.ndarray | None = None) -> np.ndarray:
+        totals = np.bincount(
+            cells, weights=weights, minlength=len(group_ranks) * n_buckets
+        )
+        return totals.reshape(len(group_ranks), n_buckets).cumsum(axis=1)
+
+    window_index = np.searchsorted(thresholds, window_values)
+    lower_index = np.searchsorted(thresholds, band_lowers)
+    row_counts = below()
+    tx_counts = below(enriched["tx_id"].notna().to_numpy()[rows].astype(float))
+    fee_sums = below(enriched["fee_stx"].fillna(0.0).to_numpy()[rows])
+    nv_sums = below(enriched["nv_btc"].fillna(0.0).to_numpy()[rows])
+
+    # Wallet rows come out window-major, wallets in (address, activation) order.
+    window_pos, groups = np.nonzero(row_counts[:, window_index].T > 0)
+
+    def per_window(matrix: np.ndarray, index: np.ndarray = window_index) -> np.ndarray:
+        return matrix[:, index][groups, window_pos]
+
+    tx_count = per_window(tx_counts).astype(int)
+    band_tx_count = tx_count - per_window(tx_counts, lower_index).astype(int)
+    return pd.DataFrame(
+        {
+            "address": activation["address"].to_numpy()[wallet_rows[groups]],
+            "activation_date": activation["activation_date"]
+            .iloc[wallet_rows[groups]]
+            .reset_index(drop=True),
+            "tx_count": tx_count,
+            "fee_stx_sum": per_window(fee_sums),
+            "nv_btc_sum": per_window(nv_sums),
+            "window_days": np.asarray(window_values, dtype=int)[window_pos],
+            "band_tx_count": band_tx_count,
+            "active_in_window": band_tx_count > 0,
+        }
+    )
 
 
 def compute_trailing_wallet_windows(
@@ -290,62 +344,82 @@ def compute_trailing_wallet_windows(
     Returns rows per (address, window_days):
       - tx_count, fee_stx_sum, nv_btc_sum
     """
-    if activity.empty:
-        return pd.DataFrame(
-            columns=[
-                "address",
-                "window_days",
-                "tx_count",
-                "fee_stx_sum",
-                "nv_btc_sum",
-            ]
-        )
+    empty = pd.DataFrame(
+        columns=[
+            "address",
+            "window_days",
+            "tx_count",
+            "fee_stx_sum",
+            "nv_btc_sum",
+        ]
+    )
+    window_values = sorted(set(int(x) for x in windows if x > 0))
+    if activity.empty or not window_values:
+        return empty
 
-    # Normalize timestamps and join prices once
+    # Normalize timestamps and join prices once; block_time comes back
+    # tz-aware, so it compares directly against as_of.
     enriched = _enrich_activity_with_prices(activity, price_panel)
-    enriched = enriched.copy()
-    enriched["block_time"] = pd.to_datetime(enriched["block_time"], utc=True)
 
     if as_of is None:
         as_of = datetime.now(UTC)
     if as_of.tzinfo is None:
         as_of = as_of.replace(tzinfo=UTC)
 
-    results: list[pd.DataFrame] = []
-    for w in sorted(set(int(x) for x in windows if x > 0)):
-        start = as_of - timedelta(days=w)
-        window_slice = enriched[(enriched["block_time"] >= start) & (enriched["block_time"] < as_of)]
-        if window_slice.empty:
-            continue
-        agg = (
-            window_slice.groupby(["address"])[["tx_id", "fee_stx", "nv_btc"]]
-            .agg(
-                tx_count=("tx_id", "count"),
-                fee_stx_sum=("fee_stx", "sum"),
-                nv_btc_sum=("nv_btc", "sum"),
-            )
-            .reset_index()
+    # Windows are nested, so each row is tagged with the shortest window it
+    # falls in (block_time in [as_of - w, as_of)) and per-wallet cumulative
+    # sums over the tags give every window from one pass.
+    age = (pd.Timestamp(as_of) - enriched["block_time"]).to_numpy()
+    window_lengths = np.asarray(window_values, dtype="int64") * np.timedelta64(1, "D")
+    buckets = np.searchsorted(window_lengths, age, side="left")
+    in_range = np.flatnonzero(
+        (age > np.timedelta64(0, "ns")) & (buckets < len(window_values))
+    )
+    wallet_codes, wallets = pd.factorize(
+        enriched["address"].to_numpy()[in_range], sort=True
+    )
+    has_wallet = wallet_codes >= 0
+    if not has_wallet.any():
+        return empty
+    rows = in_range[has_wallet]
+    cells = wallet_codes[has_wallet] * len(window_values) + buckets[rows]
+
+    def within(weights: np.ndarray | None = None) -> np.ndarray:
+        totals = np.bincount(
+            cells, weights=weights, minlength=len(wallets) * len(window_values)
         )
-        agg["window_days"] = w
-        results.append(agg)
+        return totals.reshape(len(wallets), len(window_values)).cumsum(axis=1)
+
+    row_counts = within()
+    # Rows come out window-major with wallets in address order, as the
+    # per-window groupby produced them.
+    window_pos, wallet_pos = np.nonzero(row_counts.T > 0)
+    return pd.DataFrame(
+        {
+            "address": wallets[wallet_pos],
+            "tx_count": within(
+                enriched["tx_id"].notna().to_numpy()[rows].astype(float)
+            )[wallet_pos, window_pos].astype(int),
+            "fee_stx_sum": within(enriched["fee_stx"].fillna(0.0).to_numpy()[rows])[
+                wallet_pos, window_pos
+            ],
+            "nv_btc_sum": within(enriched["nv_btc"].fillna(0.0).to_numpy()[rows])[
+                wallet_pos, window_pos
+            ],
+            "window_days": np.asarray(window_values, dtype=int)[window_pos],
+        }
+    )
 
-    if not results:
-        return pd.DataFrame(
-            columns=[
-                "address",
-                "window_days",
-                "tx_count",
-                "fee_stx_sum",
-                "nv_btc_sum",
-            ]
-        )
 
-    out = pd.concat(results, ignore_index=True)
-    out["tx_count"] = out["tx_count"].astype(int)
-    out["fee_stx_sum"] = out["fee_stx_sum"].astype(float)
-    out["nv_btc_sum"] = out["nv_btc_sum"].astype(float)
-    out["window_days"] = out["window_days"].astype(int)
-    return out
+def _funded_by_address(balances: pd.DataFrame, threshold_ustx: int) -> pd.Series:
+    """Funded flag per address from a wallet_balances frame (last row wins)."""
+    if balances.empty:
+        return pd.Series(dtype=bool)
+    funded = (
+        balances["balance_ustx"].fillna(0).astype("int64").ge(threshold_ustx)
+    )
+    funded.index = balances["address"].astype(str)
+    return funded[~funded.index.duplicated(keep="last")]
 
 
 def classify_wallets(
@@ -372,10 +446,11 @@ def classify_wallets(
     addresses = activation["address"].astype(str).tolist()
 
     # Determine funded via balances
-    funded_map: dict[str, bool] = {}
     if balance_lookup is not None:
-        for addr, bal in balance_lookup.items():
-            funded_map[str(addr)] = bool(bal >= thresholds.funded_stx_min)
+        funded_map = pd.Series(balance_lookup, dtype=float).ge(
+            thresholds.funded_stx_min
+        )
+        funded_map.index = funded_map.index.astype(str)
     else:
         snapshot_date = datetime.now(UTC).date()
         threshold_ustx = int(thresholds.funded_stx_min * MICROSTX_PER_STX)
@@ -384,11 +459,10 @@ def classify_wallets(
             as_of_date=snapshot_date,
             db_path=wallet_db_path,
         )
-        if not stored_balances.empty:
-            for row in stored_balances.itertuples():
-                balance_ustx = int(row.balance_ustx) if pd.notna(row.balance_ustx) else 0
-                funded_map[str(row.address)] = bool(balance_ustx >= threshold_ustx)
-        missing_addresses = [addr for addr in addresses if addr not in funded_map]
+        funded_map = _funded_by_address(stored_balances, threshold_ustx)
+        missing_addresses = [
+            addr for addr in addresses if addr not in funded_map.index
+        ]
         if missing_addresses:
             wallet_metrics.ensure_wallet_balances(
                 missing_addresses,
@@ -402,14 +476,9 @@ def classify_wallets(
                 max_age_days=None,
                 db_path=wallet_db_path,
             )
-            if not refreshed.empty:
-                for row in refreshed.itertuples():
-                    balance_ustx = (
-                        int(row.balance_ustx) if pd.notna(row.balance_ustx) else 0
-                    )
-                    funded_map[str(row.address)] = bool(
-                        balance_ustx >= threshold_ustx
-                    )
+            refreshed_map = _funded_by_address(refreshed, threshold_ustx)
+            funded_map = pd.concat([funded_map, refreshed_map])
+            funded_map = funded_map[~funded_map.index.duplicated(keep="last")]
 
     # Active in 30d: tx_count >= threshold in window 30
     w30 = (
@@ -417,30 +486,28 @@ def classify_wallets(
         if not windows_agg.empty
         else pd.DataFrame()
     )
-    tx_count_map = (
-        w30.set_index("address")["tx_count"].to_dict() if not w30.empty else {}
-    )
-    fee_sum_map = (
-        w30.set_index("address")["fee_stx_sum"].to_dict() if not w30.empty else {}
-    )
-
-    rows: list[dict[str, object]] = []
-    for row in activation.itertuples(index=False):
-        addr = str(row.address)
-        rows.append(
-            {
-                "address": addr,
-                "activation_date": row.activation_date,
-                "funded": bool(funded_map.get(addr, False)),
-                "active_30d": bool(
-                    tx_count_map.get(addr, 0) >= thresholds.active_min_tx_30d
-                ),
-                "value_30d": bool(
-                    fee_sum_map.get(addr, 0.0) >= thresholds.value_min_fee_stx_30d
-                ),
-            }
+    address = activation["address"].astype(str).reset_index(drop=True)
+    if w30.empty:
+        tx_count = pd.Series(0, index=address.index)
+        fee_sum = pd.Series(0.0, index=address.index)
+    else:
+        w30_by_address = w30.drop_duplicates("address", keep="last").set_index(
+            "address"
         )
-    return pd.DataFrame(rows)
+        tx_count = address.map(w30_by_address["tx_count"]).fillna(0)
+        fee_sum = address.map(w30_by_address["fee_stx_sum"]).fillna(0.0)
+
+    return pd.DataFrame(
+        {
+            "address": address,
+            "activation_date": activation["activation_date"]
+            .dt.as_unit("ns")
+            .reset_index(drop=True),
+            "funded": address.map(funded_map).eq(True),
+            "active_30d": tx_count >= thresholds.active_min_tx_30d,
+            "value_30d": fee_sum >= thresholds.value_min_fee_stx_30d,
+        }
+    )
 
 
 def compute_value_pipeline(
@@ -483,8 +550,9 @@ def compute_value_pipeline(
 
     # Load prices and compute aggregates
     price_panel = load_price_panel_for_activity(activity, force_refresh=force_refresh)
+    enriched = _enrich_activity_with_prices(activity, price_panel)
     windows_agg = compute_wallet_windows(
-        activity, first_seen, price_panel, windows=windows
+        enriched, first_seen, price_panel, windows=windows
     )
     cls = classify_wallets(
         first_seen=first_seen,
@@ -495,7 +563,7 @@ def compute_value_pipeline(
     )
 
     return {
-        "activity": _enrich_activity_with_prices(activity, price_panel),
+        "activity": enriched,
         "windows": windows_agg,
         "classification": cls,
     }
@@ -507,19 +575,29 @@ def compute_network_daily(activity: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(
             columns=["activity_date", "tx_count", "wallets", "fee_stx_sum", "nv_btc_sum"]
         )
-    df = activity.copy()
-    df["activity_date"] = pd.to_datetime(df["block_time"], utc=True).dt.floor("D")
-    grouped = (
-        df.groupby("activity_date")
-        .agg(
-            tx_count=("tx_id", "count"),
-            wallets=("address", "nunique"),
-            fee_stx_sum=("fee_stx", "sum"),
-            nv_btc_sum=("nv_btc", "sum"),
-        )
-        .reset_index()
+    activity_date = pd.to_datetime(activity["block_time"], utc=True).dt.floor("D")
+    by_day = activity.groupby(activity_date.rename("activity_date"))
+    grouped = by_day.agg(
+        tx_count=("tx_id", "count"),
+        fee_stx_sum=("fee_stx", "sum"),
+        nv_btc_sum=("nv_btc", "sum"),
+    )
+    # Distinct wallets per day: factorize the addresses once, then count the
+    # distinct sorted (day, address) code pairs instead of running nunique
+    # over the address strings of every group.
+    day_codes = by_day.ngroup().fillna(-1).to_numpy(dtype="int64")
+    address_codes, uniques = pd.factorize(activity["address"])
+    counted = (day_codes >= 0) & (address_codes >= 0)
+    n_addresses = max(len(uniques), 1)
+    pairs = np.sort(day_codes[counted] * n_addresses + address_codes[counted])
+    first_of_pair = np.ones(len(pairs), dtype=bool)
+    first_of_pair[1:] = pairs[1:] != pairs[:-1]
+    grouped.insert(
+        1,
+        "wallets",
+        np.bincount(pairs[first_of_pair] // n_addresses, minlength=len(grouped)),
     )
-    return grouped.sort_values("activity_date")
+    return grouped.reset_index().sort_values("activity_date")
 
 
 def summarize_value_kpis(
@@ -683,7 +761,7 @@ def compute_cpa_panel(
             ]
         )
 
-    window_df = windows_agg[windows_agg["window_days"] == window_days].copy()
+    window_df = windows_agg[windows_agg["window_days"] == window_days]
     if window_df.empty:
         return pd.DataFrame(
             columns=[
@@ -696,11 +774,9 @@ def compute_cpa_panel(
             ]
         )
 
-    window_df = window_df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(window_df["activation_date"]):
-        window_df["activation_date"] = pd.to_datetime(
-            window_df["activation_date"], utc=True
-        )
+    window_df = window_df.assign(
+        activation_date=_as_utc_series(window_df["activation_date"])
+    )
     grouped = (
         window_df.groupby("activation_date")
         .agg(
@@ -718,7 +794,6 @@ def compute_cpa_panel(
 
     grouped["payback_multiple"] = grouped["avg_waltv_stx"] / cpa_target_stx
     grouped["above_target"] = grouped["avg_waltv_stx"] >= cpa_target_stx
-    grouped["activation_date"] = grouped["activation_date"].dt.tz_convert(UTC)
     return grouped.reset_index(drop=True)
 
 
@@ -748,7 +823,7 @@ def compute_cpa_panel_by_channel(
             ]
         )
 
-    df = windows_agg[windows_agg["window_days"] == window_days].copy()
+    df = windows_agg[windows_agg["window_days"] == window_days]
     if df.empty:
         return pd.DataFrame(
             columns=[
@@ -762,22 +837,19 @@ def compute_cpa_panel_by_channel(
             ]
         )
 
-    if not pd.api.types.is_datetime64_any_dtype(df["activation_date"]):
-        df["activation_date"] = pd.to_datetime(df["activation_date"], utc=True)
-    else:
-        df["activation_date"] = df["activation_date"].dt.tz_convert(UTC)
-
-    channel_df = address_channel_map.copy()
-    channel_df["address"] = channel_df["address"].astype(str)
-    if "activation_date" in channel_df.columns:
-        channel_df["activation_date"] = pd.to_datetime(
-            channel_df["activation_date"], utc=True
-        ).dt.floor("D")
-    else:
+    df = df.assign(activation_date=_as_utc_series(df["activation_date"]))
+
+    if "activation_date" not in address_channel_map.columns:
         raise ValueError("address_channel_map must include activation_date")
-    if "channel" not in channel_df.columns:
+    if "channel" not in address_channel_map.columns:
         raise ValueError("address_channel_map must include channel column")
-    channel_df["channel"] = channel_df["channel"].fillna("Unknown").astype(str)
+    channel_df = address_channel_map.assign(
+        address=address_channel_map["address"].astype(str),
+        activation_date=_as_utc_series(
+            address_channel_map["activation_date"]
+        ).dt.floor("D"),
+        channel=address_channel_map["channel"].fillna("Unknown").astype(str),
+    )
 
     merged = df.merge(
         channel_df,
@@ -803,14 +875,9 @@ def compute_cpa_panel_by_channel(
 
     if cac_by_channel:
         grouped["cac_stx"] = grouped["channel"].map(cac_by_channel)
-        grouped["payback_multiple"] = grouped.apply(
-            lambda row: (
-                row["avg_waltv_stx"] / row["cac_stx"]
-                if pd.notna(row["cac_stx"]) and row["cac_stx"]
-                else pd.NA
-            ),
-            axis=1,
-        )
+        # Channels without a (non-zero) CAC get pd.NA rather than a payback.
+        cac = pd.to_numeric(grouped["cac_stx"], errors="coerce").astype("Float64")
+        grouped["payback_multiple"] = grouped["avg_waltv_stx"] / cac.mask(cac == 0)
     else:
         grouped["cac_stx"] = pd.NA
         grouped["payback_multiple"] = pd.NA
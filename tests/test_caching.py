@@ -97,3 +97,59 @@ def test_aggregate_rewards_cache(monkeypatch, tmp_path):
     df_second = hiro.aggregate_rewards_by_burn_block()
     assert len(df_second) == 2
     assert call_count["iter"] == 1  # loaded from cache
+
+
+def test_write_parquet_zstd_round_trip(tmp_path):
+    from src.cache_utils import read_parquet, write_parquet_zstd
+
+    frame = pd.DataFrame(
+        {
+            "address": ["A", "B"],
+            "first_seen": [
+                pd.Timestamp("2025-01-01T00:00Z"),
+                pd.Timestamp("2025-01-02T12:00Z"),
+            ],
+        }
+    )
+    path = tmp_path / "nested" / "first_seen.parquet"
+    write_parquet_zstd(path, frame)
+
+    loaded = read_parquet(path)
+    assert loaded["address"].tolist() == ["A", "B"]
+    assert loaded["first_seen"].tolist() == frame["first_seen"].tolist()
+
+    write_parquet_zstd(path, frame.iloc[0:0])
+    assert read_parquet(path).empty
+
+
+def test_scratch_connection_shares_one_database_with_private_views():
+    import duckdb
+    import pytest
+
+    from src.cache_utils import close_scratch_connection, scratch_connection
+
+    try:
+        with scratch_connection() as first:
+            first.register("frame", pd.DataFrame({"x": [1, 2]}))
+            with scratch_connection() as second:
+                with pytest.raises(duckdb.CatalogException):
+                    second.execute("SELECT * FROM frame")
+            assert first.execute("SELECT SUM(x) FROM frame").fetchone() == (3,)
+    finally:
+        close_scratch_connection()
+
+
+def test_write_parquet_zstd_reuses_scratch_connection(monkeypatch, tmp_path):
+    import duckdb
+
+    from src.cache_utils import read_parquet, scratch_connection, write_parquet_zstd
+
+    scratch_connection().close()
+
+    def fail_connect(*args, **kwargs):
+        raise AssertionError("write_parquet_zstd opened a new DuckDB connection")
+
+    monkeypatch.setattr(duckdb, "connect", fail_connect)
+    path = tmp_path / "frame.parquet"
+    write_parquet_zstd(path, pd.DataFrame({"x": [1, 2]}))
+    assert read_parquet(path)["x"].tolist() == [1, 2]
@@ -53,3 +53,10 @@ def test_cached_json_request_hits_cache(temp_cache):
     assert second == {"value": 1}
     # Only first call should hit network because of cache reuse.
     assert session.calls == 1
+
+
+def test_build_session_pool_size():
+    session = http_utils.build_session({"User-Agent": "test"}, pool_maxsize=24)
+    adapter = session.get_adapter("https://api.hiro.so")
+    assert adapter._pool_maxsize == 24
+    assert session.headers["User-Agent"] == "test"
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import logging
+import subprocess
+import sys
 from datetime import UTC, datetime, timedelta, date
 
 import duckdb
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import pytest
 
 from src import config as cfg
@@ -80,6 +85,7 @@ def test_load_recent_wallet_activity_filters_transactions(monkeypatch, tmp_path)
     assert activity.iloc[0]["address"] == "SP111"
     assert activity.iloc[0]["fee_ustx"] == 1200
     assert str(activity.iloc[0]["activity_date"].tz) == "UTC"
+    assert (activity["activity_date"] == activity["block_time"].dt.floor("D")).all()
 
 
 def test_compute_new_and_active_wallets(tmp_path):
@@ -344,6 +350,7 @@ def test_segmented_retention_panel_filters_by_funding(monkeypatch, tmp_path):
         db_path=db_path,
     )
     assert not panel.empty
+    assert panel["segment"].dtype == wallet_metrics.SEGMENT_DTYPE
     lookup = {
         (row.segment, row.window_days): (row.retained_users, row.eligible_users, row.retention_pct)
         for row in panel.itertuples()
@@ -396,6 +403,40 @@ def test_collect_activation_day_funding_uses_fallback(monkeypatch, tmp_path):
     assert pd.Timestamp(row["snapshot_version"]) == pd.Timestamp("2025-01-01T00:00:00Z")
 
 
+def test_collect_activation_day_funding_marks_missing_snapshots(monkeypatch, tmp_path):
+    db_path = tmp_path / "funding.duckdb"
+    monkeypatch.setattr(wallet_metrics, "FUNDED_D0_CACHE_PATH", tmp_path / "funded.parquet")
+    first_seen = pd.DataFrame(
+        {
+            "address": ["A", "B"],
+            "first_seen": [
+                pd.Timestamp("2025-01-01T12:00:00Z"),
+                pd.Timestamp("2025-01-02T12:00:00Z"),
+            ],
+        }
+    )
+    wallet_metrics.ensure_wallet_balances(
+        ["A"],
+        as_of_date=date(2025, 1, 1),
+        funded_threshold_stx=10.0,
+        fetcher=lambda address: {"stx": {"balance": "12000000"}},
+        db_path=db_path,
+    )
+
+    funded = wallet_metrics.collect_activation_day_funding(
+        first_seen, db_path=db_path, persist=True
+    ).set_index("address")
+
+    assert funded.loc["A", "has_snapshot"]
+    assert funded.loc["A", "balance_ustx"] == 12_000_000
+    assert not funded.loc["B", "has_snapshot"]
+    assert pd.isna(funded.loc["B", "balance_ustx"])
+    assert pd.isna(funded.loc["B", "snapshot_version"])
+    assert funded["updated_at"].notna().all()
+    cached = wallet_metrics._load_funded_d0_cache().set_index("address")
+    assert cached.loc["A", "funded_d0"] and not cached.loc["B", "funded_d0"]
+
+
 def test_activation_frame_clamps_to_metrics_data_start():
     start = wallet_metrics.METRICS_DATA_START
     earlier = start - pd.Timedelta(days=10)
@@ -411,6 +452,113 @@ def test_activation_frame_clamps_to_metrics_data_start():
     assert frame.iloc[0]["activation_date"] == later.floor("D")
 
 
+def test_activation_frame_reuses_result_for_same_content(monkeypatch):
+    start = wallet_metrics.METRICS_DATA_START
+    first_seen = pd.DataFrame(
+        {"address": ["A", "B"], "first_seen": [start, start + pd.Timedelta(days=1)]}
+    )
+    builds = []
+    build = wallet_metrics._build_activation_frame
+    monkeypatch.setattr(
+        wallet_metrics,
+        "_build_activation_frame",
+        lambda frame: builds.append(1) or build(frame),
+    )
+    monkeypatch.setattr(wallet_metrics, "_ACTIVATION_MEMO", None)
+
+    frame = wallet_metrics._activation_frame(first_seen)
+    frame.loc[0, "address"] = "MUTATED"
+    reused = wallet_metrics._activation_frame(first_seen.copy())
+    assert len(builds) == 1
+    assert reused["address"].tolist() == ["A", "B"]
+
+    # An in-place edit that keeps the shape and both end rows still recomputes.
+    first_seen = pd.DataFrame(
+        {"address": ["A", "B", "C"], "first_seen": [start] * 3}
+    )
+    wallet_metrics._activation_frame(first_seen)
+    first_seen.loc[1, "first_seen"] = start + pd.Timedelta(days=3)
+    refreshed = wallet_metrics._activation_frame(first_seen)
+    assert len(builds) == 3
+    assert refreshed.iloc[1]["activation_date"] == (start + pd.Timedelta(days=3)).floor("D")
+
+
+def test_fold_segment_activity_memoizes_on_content():
+    start = wallet_metrics.METRICS_DATA_START
+    members = pd.DataFrame(
+        {"address": ["A", "B"], "activation_date": [start, start], "value_30d": [True, False]}
+    )
+    activity = pd.DataFrame(
+        {
+            "address": ["A", "A", "B"],
+            "activity_date": [start, start + pd.Timedelta(days=2), start],
+        }
+    )
+    folded = wallet_metrics._fold_segment_activity(members, activity)
+    assert folded.set_index("address").loc["A", "first_return_days"] == 2
+    assert wallet_metrics._fold_segment_activity(members, activity.copy()) is folded
+
+    grown = pd.concat(
+        [activity, pd.DataFrame({"address": ["B"], "activity_date": [start + pd.Timedelta(days=5)]})],
+        ignore_index=True,
+    )
+    refreshed = wallet_metrics._fold_segment_activity(members, grown)
+    assert refreshed is not folded
+    assert refreshed.set_index("address").loc["B", "last_active_days"] == 5
+
+
+def test_fold_segment_activity_sees_changes_at_head_of_newest_first_frame():
+    start = wallet_metrics.METRICS_DATA_START
+    members = pd.DataFrame(
+        {"address": ["A", "B"], "activation_date": [start, start], "value_30d": [True, False]}
+    )
+    # Same length and same oldest rows; only the newest (first) row differs.
+    oldest = pd.DataFrame({"address": ["A", "B"] * 800, "activity_date": [start] * 1600})
+    before = pd.concat(
+        [pd.DataFrame({"address": ["A"], "activity_date": [start + pd.Timedelta(days=3)]}), oldest],
+        ignore_index=True,
+    )
+    after = before.copy()
+    after.loc[0, "address"] = "B"
+
+    folded = wallet_metrics._fold_segment_activity(members, before)
+    refreshed = wallet_metrics._fold_segment_activity(members, after)
+    assert refreshed is not folded
+    assert folded.set_index("address").loc["A", "last_active_days"] == 3
+    assert refreshed.set_index("address").loc["B", "last_active_days"] == 3
+
+
+def test_retention_offsets_reused_across_modes():
+    start = wallet_metrics.METRICS_DATA_START
+    first_seen = pd.DataFrame({"address": ["A", "B"], "first_seen": [start, start]})
+    activity = pd.DataFrame(
+        {
+            "address": ["A", "B", "A"],
+            "activity_date": [start, start, start + pd.Timedelta(days=20)],
+        }
+    )
+    offsets = wallet_metrics._retention_offsets(activity, first_seen)
+    assert offsets.cohort_sizes.tolist() == [2]
+    assert wallet_metrics._retention_offsets(activity.copy(), first_seen) is offsets
+    with pytest.raises(ValueError):
+        offsets.days[0] = 5
+    with pytest.raises(ValueError):
+        offsets.cohort_sizes.iloc[0] = 5
+
+    grown = pd.concat(
+        [activity, pd.DataFrame({"address": ["B"], "activity_date": [start + pd.Timedelta(days=25)]})],
+        ignore_index=True,
+    )
+    refreshed = wallet_metrics._retention_offsets(grown, first_seen)
+    assert refreshed is not offsets
+    assert refreshed.days.tolist() == [0, 0, 20, 25]
+    assert wallet_metrics._retention_offsets(grown, first_seen.copy()) is refreshed
+
+    edited = first_seen.copy()
+    edited.loc[1, "address"] = "C"
+    assert wallet_metrics._retention_offsets(grown, edited) is not refreshed
+
+
 def test_retention_drops_pre_coverage_cohorts():
     start = wallet_metrics.METRICS_DATA_START
     earlier = start - pd.Timedelta(days=5)
@@ -594,3 +742,822 @@ def test_segmented_retention_panel_active_band_survival():
     assert pytest.approx(all_rows.loc[30, "retention_pct"]) == 50.0
     assert pytest.approx(all_rows.loc[60, "retention_pct"]) == 50.0
     assert pytest.approx(all_rows.loc[90, "retention_pct"]) == 0.0
+
+
+def test_prepare_transactions_filters_and_coerces():
+    results = [
+        {
+            "tx_id": "ok",
+            "block_time": 1_735_000_000,
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP1",
+            "fee_rate": "1200",
+            "tx_type": "contract_call",
+            "burn_block_time": 1_735_000_010,
+        },
+        {
+            "tx_id": "bad-fee",
+            "block_time": 1_735_000_100,
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP2",
+            "fee": "n/a",
+            "tx_type": "token_transfer",
+        },
+        {
+            "tx_id": "non-canonical",
+            "block_time": 1_735_000_000,
+            "canonical": False,
+            "tx_status": "success",
+            "sender_address": "SP3",
+        },
+        {
+            "tx_id": "failed",
+            "block_time": 1_735_000_000,
+            "canonical": True,
+            "tx_status": "abort_by_response",
+            "sender_address": "SP4",
+        },
+        {
+            "tx_id": "no-sender",
+            "block_time": 1_735_000_000,
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "",
+        },
+        {
+            "tx_id": "no-time",
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP5",
+        },
+        {
+            "tx_id": "string-time",
+            "block_time": "1735000200",
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP6",
+            "fee_rate": 300,
+            "burn_block_time": "1735000210",
+        },
+        {
+            "tx_id": "bad-time",
+            "block_time": "soon",
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP7",
+        },
+        {
+            "tx_id": "truthy-canonical",
+            "block_time": 1_735_000_300,
+            "canonical": 1,
+            "tx_status": "success",
+            "sender_address": "SP8",
+        },
+        {
+            "tx_id": "no-canonical",
+            "block_time": 1_735_000_300,
+            "tx_status": "success",
+            "sender_address": "SP9",
+        },
+    ]
+    frame = wallet_metrics._prepare_transactions(results).to_pandas()
+
+    assert frame["tx_id"].tolist() == [
+        "ok",
+        "bad-fee",
+        "string-time",
+        "truthy-canonical",
+    ]
+    assert frame["canonical"].all()
+    assert frame["fee_ustx"].tolist() == [1200, 0, 300, 0]
+    assert frame.loc[2, "block_time"] == pd.Timestamp(1_735_000_200, unit="s", tz="UTC")
+    assert frame.loc[2, "burn_block_time"] == pd.Timestamp(
+        1_735_000_210, unit="s", tz="UTC"
+    )
+    assert frame.loc[0, "block_time"] == pd.Timestamp(1_735_000_000, unit="s", tz="UTC")
+    assert frame.loc[0, "burn_block_time"] == pd.Timestamp(
+        1_735_000_010, unit="s", tz="UTC"
+    )
+    assert pd.isna(frame.loc[1, "burn_block_time"])
+    assert wallet_metrics._prepare_transactions([]).num_rows == 0
+
+
+def test_page_cursor_prefers_burn_time_and_skips_invalid():
+    results = [
+        {"burn_block_time": 1_000, "block_time": 900},
+        {"burn_block_time": None, "block_time": 950},
+        {"burn_block_time": "oops"},
+        {},
+    ]
+    assert wallet_metrics._page_cursor(results) == 949
+    assert wallet_metrics._page_cursor([{}, {"block_time": None}]) is None
+    assert wallet_metrics._page_cursor([]) is None
+
+
+def test_prepare_page_cursor_counts_filtered_rows():
+    # Non-canonical rows are dropped from the frame but still advance the cursor.
+    rows, cursor = wallet_metrics._prepare_page(
+        [{"tx_id": "x", "block_time": 500, "canonical": False, "sender_address": "SP1"}]
+    )
+    assert rows.num_rows == 0
+    assert cursor == 499
+
+
+def test_ensure_wallet_balances_only_fetches_missing(tmp_path):
+    db_path = tmp_path / "wallets.duckdb"
+    fetched: list[str] = []
+
+    def fetcher(address: str) -> dict[str, dict[str, str]]:
+        fetched.append(address)
+        return {"stx": {"balance": "20000000"}}
+
+    snapshot = date(2025, 3, 1)
+    wallet_metrics.ensure_wallet_balances(
+        ["A", "B"], as_of_date=snapshot, fetcher=fetcher, db_path=db_path
+    )
+    fetched.clear()
+    inserted = wallet_metrics.ensure_wallet_balances(
+        ["B", "C", "A", "C"], as_of_date=snapshot, fetcher=fetcher, db_path=db_path
+    )
+    assert inserted == 1
+    assert fetched == ["C"]
+
+
+def test_ensure_wallet_balances_releases_lock_while_fetching(tmp_path):
+    db_path = tmp_path / "wallets.duckdb"
+    opened_elsewhere: list[int] = []
+
+    def fetcher(address: str) -> dict[str, dict[str, str]]:
+        # Another process can only open the file if no lock is held.
+        probe = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                f"import duckdb; duckdb.connect({str(db_path)!r}).close()",
+            ],
+            capture_output=True,
+        )
+        opened_elsewhere.append(probe.returncode)
+        return {"stx": {"balance": "20000000"}}
+
+    inserted = wallet_metrics.ensure_wallet_balances(
+        ["A"], as_of_date=date(2025, 3, 1), fetcher=fetcher, db_path=db_path
+    )
+    assert inserted == 1
+    assert opened_elsewhere == [0]
+
+
+def test_insert_transactions_upserts_naive_utc(tmp_path):
+    page = [
+        {
+            "tx_id": "t1",
+            "block_time": 1_735_000_000,
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP1",
+            "fee_rate": 100,
+        }
+    ]
+    conn = duckdb.connect(str(tmp_path / "tx.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        conn.execute("SET TimeZone='America/New_York'")
+        wallet_metrics._insert_transactions(
+            conn, wallet_metrics._prepare_transactions(page)
+        )
+        page[0]["fee_rate"] = 250
+        wallet_metrics._insert_transactions(
+            conn, wallet_metrics._prepare_transactions(page)
+        )
+        rows = conn.execute("SELECT tx_id, block_time, fee_ustx FROM transactions").fetchall()
+    finally:
+        conn.close()
+    assert rows == [("t1", datetime(2024, 12, 24, 0, 26, 40), 250)]
+
+
+def test_insert_transactions_replaces_tx_with_moved_block_time(tmp_path):
+    page = [
+        {
+            "tx_id": "0xabc",
+            "block_time": 1_700_000_000,
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP1",
+            "fee_rate": 1,
+        }
+    ]
+    conn = duckdb.connect(str(tmp_path / "moved.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        wallet_metrics._insert_transactions(
+            conn, wallet_metrics._prepare_transactions(page)
+        )
+        page[0]["block_time"] = 1_700_090_000
+        wallet_metrics._insert_transactions(
+            conn, wallet_metrics._prepare_transactions(page)
+        )
+        rows = conn.execute("SELECT tx_id, block_time FROM transactions").fetchall()
+    finally:
+        conn.close()
+    assert rows == [("0xabc", datetime(2023, 11, 15, 23, 13, 20))]
+
+
+def test_load_recent_wallet_activity_applies_coverage_start_in_sql(tmp_path):
+    db_path = tmp_path / "coverage.duckdb"
+    page = [
+        {
+            "tx_id": tx_id,
+            "block_time": int(ts.timestamp()),
+            "canonical": True,
+            "tx_status": "success",
+            "sender_address": "SP1",
+            "fee_rate": 100,
+        }
+        for tx_id, ts in [
+            ("before", wallet_metrics.METRICS_DATA_START - timedelta(hours=1)),
+            ("after", wallet_metrics.METRICS_DATA_START + timedelta(hours=1)),
+        ]
+    ]
+    with wallet_metrics._connect(read_only=False, db_path=db_path) as conn:
+        wallet_metrics._ensure_schema(conn)
+        wallet_metrics._insert_transactions(
+            conn, wallet_metrics._prepare_transactions(page)
+        )
+    activity = wallet_metrics.load_recent_wallet_activity(
+        max_days=365, db_path=db_path
+    )
+    assert activity["tx_id"].tolist() == ["after"]
+    assert activity.index.tolist() == [0]
+
+
+def test_connect_releases_lock_on_exit(tmp_path):
+    db_path = tmp_path / "unshared.duckdb"
+    with wallet_metrics._connect(db_path=db_path) as conn:
+        conn.execute("CREATE TABLE t AS SELECT 1 AS x")
+    with duckdb.connect(str(db_path)) as other:
+        assert other.execute("SELECT x FROM t").fetchone() == (1,)
+
+
+def test_compact_transactions_orders_and_keeps_primary_key(tmp_path):
+    conn = duckdb.connect(str(tmp_path / "compact.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        for tx_id, ts in (("late", 1_735_100_000), ("early", 1_735_000_000)):
+            page = [
+                {
+                    "tx_id": tx_id,
+                    "block_time": ts,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 1,
+                }
+            ]
+            wallet_metrics._insert_transactions(
+                conn, wallet_metrics._prepare_transactions(page)
+            )
+        wallet_metrics._compact_transactions(conn)
+        ordered = [row[0] for row in conn.execute("SELECT tx_id FROM transactions").fetchall()]
+        assert ordered == ["early", "late"]
+        with pytest.raises(duckdb.ConstraintException):
+            conn.execute(
+                "INSERT INTO transactions (tx_id) VALUES ('early')"
+            )
+    finally:
+        conn.close()
+
+
+def test_update_first_seen_cache_keeps_earliest(monkeypatch, tmp_path):
+    cache_path = tmp_path / "first_seen.parquet"
+    monkeypatch.setattr(wallet_metrics, "FIRST_SEEN_CACHE_PATH", cache_path)
+    pd.DataFrame(
+        {
+            "address": ["A", "OLD"],
+            "first_seen": [
+                pd.Timestamp("2025-01-05T00:00Z"),
+                pd.Timestamp("2024-01-01T00:00Z"),
+            ],
+        }
+    ).to_parquet(cache_path, index=False)
+    activity = pd.DataFrame(
+        {
+            "address": ["A", "B", "B"],
+            "block_time": [
+                pd.Timestamp("2025-02-01T00:00Z"),
+                pd.Timestamp("2025-03-02T08:00Z"),
+                pd.Timestamp("2025-03-01T08:00Z"),
+            ],
+        }
+    )
+    result = wallet_metrics.update_first_seen_cache(activity)
+
+    assert result["address"].tolist() == ["A", "B"]
+    assert result.set_index("address")["first_seen"].to_dict() == {
+        "A": pd.Timestamp("2025-01-05T00:00Z"),
+        "B": pd.Timestamp("2025-03-01T08:00Z"),
+    }
+    assert str(result["first_seen"].dt.tz) == "UTC"
+    assert wallet_metrics.load_first_seen_cache()["address"].tolist() == ["A", "B"]
+
+
+def test_load_first_seen_cache_reads_naive_utc_files(monkeypatch, tmp_path):
+    cache_path = tmp_path / "first_seen.parquet"
+    monkeypatch.setattr(wallet_metrics, "FIRST_SEEN_CACHE_PATH", cache_path)
+    pd.DataFrame(
+        {
+            "address": ["A", "OLD"],
+            "first_seen": [
+                pd.Timestamp("2025-01-05T06:00"),
+                pd.Timestamp("2024-01-01T00:00"),
+            ],
+        }
+    ).to_parquet(cache_path, index=False)
+
+    cached = wallet_metrics.load_first_seen_cache()
+
+    assert cached["address"].tolist() == ["A"]
+    assert cached.loc[0, "first_seen"] == pd.Timestamp("2025-01-05T06:00Z")
+    assert str(cached["first_seen"].dt.tz) == "UTC"
+
+
+def test_load_wallet_balances_returns_latest_snapshot(tmp_path):
+    db_path = tmp_path / "balances.duckdb"
+    balances = iter([5, 25, 40])
+
+    def fetcher(address: str) -> dict[str, dict[str, str]]:
+        return {"stx": {"balance": str(next(balances) * 1_000_000)}}
+
+    for as_of in (date(2025, 3, 28), date(2025, 3, 30), date(2025, 4, 2)):
+        wallet_metrics.ensure_wallet_balances(
+            ["A"], as_of_date=as_of, fetcher=fetcher, db_path=db_path
+        )
+    loaded = wallet_metrics.load_wallet_balances(
+        ["A"], as_of_date=date(2025, 4, 1), db_path=db_path
+    )
+    assert len(loaded) == 1
+    assert loaded.loc[0, "balance_ustx"] == 25_000_000
+    assert bool(loaded.loc[0, "funded"]) is True
+    assert loaded["address"].dtype == object
+    assert loaded["address"].tolist() == ["A"]
+
+
+def test_insert_transactions_unregisters_batch(tmp_path):
+    rows = wallet_metrics._prepare_transactions(
+        [
+            {
+                "tx_id": "t1",
+                "block_time": 1_735_000_000,
+                "canonical": True,
+                "tx_status": "success",
+                "sender_address": "SP1",
+                "fee_rate": 1,
+            }
+        ]
+    )
+    assert rows.schema.field("block_time").type.tz == "UTC"
+    conn = duckdb.connect(str(tmp_path / "batch.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        assert wallet_metrics._insert_transactions(conn, rows) == 1
+        with pytest.raises(duckdb.CatalogException):
+            conn.execute("SELECT * FROM transactions_batch")
+    finally:
+        conn.close()
+
+
+def test_failed_insert_leaves_transactions_untouched(tmp_path):
+    good = wallet_metrics._prepare_transactions(
+        [
+            {
+                "tx_id": "t1",
+                "block_time": 1_735_000_000,
+                "canonical": True,
+                "tx_status": "success",
+                "sender_address": "SP1",
+                "fee_rate": 1,
+            }
+        ]
+    )
+    bad = good.set_column(0, "tx_id", pa.array([None], pa.string()))
+    conn = duckdb.connect(str(tmp_path / "rollback.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        with pytest.raises(duckdb.Error):
+            wallet_metrics._insert_transactions(conn, bad)
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] == 0
+        assert wallet_metrics._insert_transactions(conn, good) == 1
+        assert conn.execute("SELECT tx_id FROM transactions").fetchall() == [("t1",)]
+    finally:
+        conn.close()
+
+
+def test_historical_sync_batches_page_inserts(monkeypatch, tmp_path):
+    base = int(datetime(2025, 4, 1, 12, 0, tzinfo=UTC).timestamp())
+
+    def fake_fetch_transactions_page(**kwargs):
+        end_time = kwargs["end_time"]
+        if end_time < base - 5 * 3600:
+            return {"results": []}
+        return {
+            "results": [
+                {
+                    "tx_id": f"tx-{end_time}",
+                    "block_time": end_time - 3600,
+                    "burn_block_time": end_time - 3600,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 10,
+                }
+            ]
+        }
+
+    inserts: list[int] = []
+    original_insert = wallet_metrics._insert_transactions
+
+    def counting_insert(conn, frame):
+        inserts.append(len(frame))
+        return original_insert(conn, frame)
+
+    monkeypatch.setattr(
+        wallet_metrics, "fetch_transactions_page", fake_fetch_transactions_page
+    )
+    monkeypatch.setattr(wallet_metrics, "_insert_transactions", counting_insert)
+    monkeypatch.setattr(wallet_metrics, "INSERT_BATCH_PAGES", 2)
+
+    conn = duckdb.connect(str(tmp_path / "history.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        pages = wallet_metrics._sync_historical_transactions(
+            conn,
+            cutoff=datetime(2025, 1, 1, tzinfo=UTC),
+            max_pages=10,
+        )
+        stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    finally:
+        conn.close()
+    assert pages == 6
+    assert inserts == [2, 2, 1]
+    assert stored == 5
+
+
+@pytest.mark.parametrize("max_pages", [100, 7])
+def test_historical_sync_slices_keep_history_contiguous(monkeypatch, tmp_path, max_pages):
+    base = int(datetime(2025, 4, 1, 12, 0, tzinfo=UTC).timestamp())
+
+    def fake_fetch_transactions_page(**kwargs):
+        # One transaction per hour, newest at or before end_time.
+        newest = kwargs["end_time"] - kwargs["end_time"] % 3600
+        return {
+            "results": [
+                {
+                    "tx_id": f"tx-{ts}",
+                    "block_time": ts,
+                    "burn_block_time": ts,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 10,
+                }
+                for ts in (newest, newest - 3600)
+            ]
+        }
+
+    monkeypatch.setattr(
+        wallet_metrics, "fetch_transactions_page", fake_fetch_transactions_page
+    )
+    monkeypatch.setattr(wallet_metrics, "HISTORY_SLICE_SECONDS", 6 * 3600)
+
+    conn = duckdb.connect(str(tmp_path / "sliced.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        wallet_metrics._sync_historical_transactions(
+            conn,
+            cutoff=datetime(2025, 3, 31, 12, 0, tzinfo=UTC),
+            max_pages=max_pages,
+        )
+        stored = conn.execute(
+            "SELECT epoch(block_time)::BIGINT FROM transactions ORDER BY 1 DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+    times = [row[0] for row in stored]
+    assert times[0] == base
+    # No gaps: every hour between the newest and oldest stored row is present.
+    assert times == list(range(times[0], times[-1] - 1, -3600))
+    if max_pages == 100:
+        assert times[-1] <= base - 24 * 3600
+
+
+def test_history_slice_clips_rows_before_its_start(monkeypatch):
+    base = int(datetime(2025, 4, 1, 12, 0, tzinfo=UTC).timestamp())
+
+    def fake_fetch_transactions_page(**kwargs):
+        newest = kwargs["end_time"] - kwargs["end_time"] % 3600
+        return {
+            "results": [
+                {
+                    "tx_id": f"tx-{ts}",
+                    "block_time": ts,
+                    "burn_block_time": ts,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 10,
+                }
+                for ts in (newest, newest - 3600, newest - 7200)
+            ]
+        }
+
+    monkeypatch.setattr(
+        wallet_metrics, "fetch_transactions_page", fake_fetch_transactions_page
+    )
+    start = base - 4 * 3600
+    clipped = wallet_metrics._fetch_history_slice(
+        base, start, wallet_metrics._PageBudget(10), clip=True
+    )
+    unclipped = wallet_metrics._fetch_history_slice(
+        base, start, wallet_metrics._PageBudget(10)
+    )
+
+    def stored_times(fetched):
+        return [
+            int(ts.timestamp())
+            for table in fetched.tables
+            for ts in table["block_time"].to_pylist()
+        ]
+
+    assert clipped.pages == unclipped.pages == 2
+    assert stored_times(clipped) == list(range(base, start - 1, -3600))
+    assert stored_times(unclipped)[-1] == start - 3600
+
+
+def test_latest_sync_pages_gap_to_stored_head_in_slices(monkeypatch, tmp_path, caplog):
+    base = int(datetime(2025, 4, 1, 12, 0, tzinfo=UTC).timestamp())
+    head = base - 24 * 3600
+    requested: list[int | None] = []
+
+    def fake_fetch_transactions_page(**kwargs):
+        end_time = kwargs["end_time"]
+        requested.append(end_time)
+        newest = base if end_time is None else end_time - end_time % 3600
+        return {
+            "results": [
+                {
+                    "tx_id": f"tx-{ts}",
+                    "block_time": ts,
+                    "burn_block_time": ts,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 10,
+                }
+                for ts in (newest, newest - 3600)
+            ]
+        }
+
+    monkeypatch.setattr(
+        wallet_metrics, "fetch_transactions_page", fake_fetch_transactions_page
+    )
+    monkeypatch.setattr(wallet_metrics, "HISTORY_SLICE_SECONDS", 6 * 3600)
+
+    caplog.set_level(logging.INFO, logger=wallet_metrics.LOGGER.name)
+    conn = duckdb.connect(str(tmp_path / "latest.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        conn.execute(
+            "INSERT INTO transactions (tx_id, block_time) "
+            "VALUES ('head', to_timestamp(?)::TIMESTAMP)",
+            [head],
+        )
+        wallet_metrics._sync_latest_transactions(conn, max_pages=100)
+        stored = conn.execute(
+            "SELECT epoch(block_time)::BIGINT FROM transactions "
+            "WHERE tx_id <> 'head' ORDER BY 1 DESC"
+        ).fetchall()
+    finally:
+        conn.close()
+    times = [row[0] for row in stored]
+    assert requested[0] is None
+    assert "Fetched latest slice 1/4 (3 pages)" in caplog.messages
+    assert times == list(range(base, times[-1] - 1, -3600))
+    assert times[-1] <= head
+
+
+def test_latest_sync_gap_stops_at_stored_burn_time(monkeypatch, tmp_path):
+    base = int(datetime(2025, 4, 1, 12, 0, tzinfo=UTC).timestamp())
+    head = base - 24 * 3600
+    slice_bounds: list[tuple[int, int]] = []
+
+    def fake_fetch_transactions_page(**kwargs):
+        return {
+            "results": [
+                {
+                    "tx_id": f"tx-{ts}",
+                    "block_time": ts,
+                    "burn_block_time": ts - 1800,
+                    "canonical": True,
+                    "tx_status": "success",
+                    "sender_address": "SP1",
+                    "fee_rate": 10,
+                }
+                for ts in (base, base - 3600)
+            ]
+        }
+
+    def fake_sync_time_slices(conn, *, end_time, start_time, budget, label):
+        slice_bounds.append((end_time, start_time))
+        return 0
+
+    monkeypatch.setattr(
+        wallet_metrics, "fetch_transactions_page", fake_fetch_transactions_page
+    )
+    monkeypatch.setattr(wallet_metrics, "_sync_time_slices", fake_sync_time_slices)
+
+    conn = duckdb.connect(str(tmp_path / "latest.duckdb"))
+    try:
+        wallet_metrics._ensure_schema(conn)
+        conn.execute(
+            "INSERT INTO transactions (tx_id, block_time, burn_block_time) "
+            "VALUES ('head', to_timestamp(?)::TIMESTAMP, to_timestamp(?)::TIMESTAMP)",
+            [head, head - 1800],
+        )
+        wallet_metrics._sync_latest_transactions(conn, max_pages=10)
+    finally:
+        conn.close()
+    assert slice_bounds == [(base - 3600 - 1800 - 1, head - 1800)]
+
+
+def test_retained_by_window_counts_cumulative_and_survival():
+    segment_codes = np.array([0, 0, 0, 1, 1])
+    first_return = np.array([1, 10, -1, 31, 5])
+    last_active = np.array([1, 40, 0, 31, 90])
+    windows = [7, 30]
+
+    cumulative = wallet_metrics._retained_by_window(
+        segment_codes, first_return, 2, windows, mode="cumulative"
+    )
+    survival = wallet_metrics._retained_by_window(
+        segment_codes, last_active, 2, windows, mode="survival"
+    )
+
+    assert cumulative.tolist() == [[1, 2], [1, 1]]
+    assert survival.tolist() == [[1, 1], [2, 2]]
+
+
+def test_retained_by_cohort_dedupes_wallets_per_band():
+    cohort_codes = np.array([0, 0, 0, 1, 1])
+    address_codes = np.array([0, 0, 1, 2, 2])
+    days = np.array([2, 3, 20, 0, 25])
+
+    counts = wallet_metrics._retained_by_cohort(
+        cohort_codes,
+        address_codes,
+        days,
+        n_cohorts=2,
+        n_addresses=3,
+        windows=[7, 30],
+        lowers=[0, 15],
+    )
+
+    assert counts.tolist() == [[1, 1], [0, 1]]
+
+
+def test_retained_by_cohort_handles_no_returns():
+    counts = wallet_metrics._retained_by_cohort(
+        np.array([0, 1]),
+        np.array([0, 1]),
+        np.array([0, 0]),
+        n_cohorts=2,
+        n_addresses=2,
+        windows=[7],
+        lowers=[0],
+    )
+
+    assert counts.tolist() == [[0], [0]]
+
+
+def test_fee_per_wallet_counts_wallets_without_fees_and_skips_immature_windows():
+    day = pd.Timestamp("2025-01-01T00:00Z")
+    activity = pd.DataFrame(
+        {
+            "address": ["A", "A", "B"],
+            "activity_date": [day, day + pd.Timedelta(days=3), day],
+            "fee_ustx": [1_000_000, 3_000_000, None],
+        }
+    )
+    first_seen = pd.DataFrame(
+        {"address": ["A", "B"], "first_seen": [day + pd.Timedelta(hours=5)] * 2}
+    )
+
+    stats = wallet_metrics.compute_fee_per_wallet(
+        activity, first_seen, (7, 30), today=day + pd.Timedelta(days=10)
+    )
+
+    assert stats["window_days"].tolist() == [7]
+    row = stats.iloc[0]
+    assert row["activation_date"] == day
+    assert row["wallets_observed"] == 2
+    assert row["avg_fee_stx"] == pytest.approx(2.0)
+    assert row["median_fee_stx"] == pytest.approx(2.0)
+
+
+def test_distinct_count_matches_groupby_nunique():
+    frame = pd.DataFrame(
+        {
+            "segment": ["All", "All", "All", "Value", "Value"],
+            "day": [2, 1, 1, 1, 1],
+            "address": ["A", "A", "B", "A", None],
+        }
+    )
+
+    for by in ("day", ["segment", "day"]):
+        expected = frame.groupby(by)["address"].nunique()
+        result = wallet_metrics._distinct_count(frame, by, "address")
+        pd.testing.assert_series_equal(result, expected)
+
+
+def test_value_flags_match_wallet_value_fee_sums():
+    first_seen = pd.DataFrame(
+        {"address": ["A", "B"], "first_seen": [pd.Timestamp("2025-01-01T00:00Z")] * 2}
+    )
+    block_time = pd.Timestamp("2025-01-02T10:00Z")
+    activity = pd.DataFrame(
+        {
+            "tx_id": ["a0", "a1", "a2", "b0"],
+            "address": ["A", "A", "A", "B"],
+            "block_time": [block_time] * 4,
+            "activity_date": [block_time.floor("D")] * 4,
+            "fee_ustx": [700_000, 200_000, 100_000, 1_000_000],
+        }
+    )
+    prices = pd.DataFrame(
+        {
+            "ts": pd.date_range("2025-01-01", "2025-01-03", freq="1h", tz=UTC),
+            "stx_btc": 0.000015,
+        }
+    )
+
+    flags = wallet_metrics.compute_value_flags(activity, first_seen).set_index("address")
+    windows = wallet_value.compute_wallet_windows(activity, first_seen, prices, windows=(30,))
+    expected = windows.set_index("address")["fee_stx_sum"] >= 1.0
+
+    # 0.7 + 0.2 + 0.1 STX summed as floats lands just under the 1 STX cutoff
+    # in both modules.
+    assert flags["value_30d"].to_dict() == expected.to_dict() == {"A": False, "B": True}
+
+
+def test_days_between_matches_timedelta_days():
+    start = pd.Series(pd.to_datetime(["2025-01-01T00:00Z", "2025-01-05T18:00Z"]))
+    end = pd.Series(
+        pd.to_datetime(["2025-01-03T00:00Z", "2025-01-05T06:00Z"])
+    ).dt.as_unit("us")
+
+    result = wallet_metrics._days_between(start, end)
+
+    assert result.tolist() == (end - start).dt.days.tolist() == [2, -1]
+
+
+def test_trailing_mean_matches_pandas_rolling():
+    values = np.array([3, 0, 7, 2, 9, 4, 1, 8, 5, 6], dtype="int64")
+
+    for window in (1, 3, 7, 30):
+        expected = pd.Series(values).rolling(window=window, min_periods=1).mean()
+        np.testing.assert_allclose(
+            wallet_metrics._trailing_mean(values, window), expected.to_numpy()
+        )
+
+
+def test_persist_retention_segmented_writes_parquet_and_db(monkeypatch, tmp_path):
+    db_path = tmp_path / "retention.duckdb"
+    output_path = tmp_path / "retention_segmented.parquet"
+    monkeypatch.setattr(wallet_metrics, "SEGMENTED_RETENTION_PATH", output_path)
+    panel = pd.DataFrame(
+        {
+            "window_days": [0, 15],
+            "segment": ["All", "All"],
+            "retained_users": [0, 3],
+            "eligible_users": [4, 4],
+            "retention_pct": [0.0, 75.0],
+            "anchor_window_days": [15, 15],
+            "updated_at": [pd.Timestamp("2025-04-01T08:30Z")] * 2,
+        }
+    )
+    wallet_metrics._persist_retention_segmented(
+        panel, output_path=output_path, db_path=db_path
+    )
+    with wallet_metrics._connect(read_only=True, db_path=db_path) as conn:
+        rows = conn.execute(
+            "SELECT window_days, retained_users, updated_at "
+            "FROM retention_segmented ORDER BY window_days"
+        ).fetchall()
+
+    assert rows == [
+        (0, 0, datetime(2025, 4, 1, 8, 30)),
+        (15, 3, datetime(2025, 4, 1, 8, 30)),
+    ]
+    loaded = wallet_metrics.load_retention_segmented()
+    assert loaded["retention_pct"].tolist() == [0.0, 75.0]
+    assert str(loaded["updated_at"].dt.tz) == "UTC"
@@ -60,5 +60,32 @@ def test_create_db_snapshot(monkeypatch, tmp_path: Path) -> None:
     snapshot_path = wallet_metrics.create_db_snapshot(destination=dest)
 
     assert snapshot_path == dest
-    assert snapshot_path.exists()
-    assert snapshot_path.stat().st_size == source.stat().st_size
+    with duckdb.connect(str(snapshot_path), read_only=True) as conn:
+        assert conn.execute("SELECT tx_id FROM transactions").fetchall() == [("tx1",)]
+
+
+def test_create_db_snapshot_copies_file_when_locked(monkeypatch, tmp_path: Path) -> None:
+    source = _build_test_db(tmp_path)
+    dest = tmp_path / "snapshot.duckdb"
+    monkeypatch.setattr(wallet_metrics, "DUCKDB_PATH", source)
+
+    def locked(*_args, **_kwargs):
+        raise duckdb.IOException("Could not set lock on file")
+
+    monkeypatch.setattr(wallet_metrics, "_connect", locked)
+
+    snapshot_path = wallet_metrics.create_db_snapshot(destination=dest)
+
+    assert snapshot_path.read_bytes() == source.read_bytes()
+
+
+def test_open_read_snapshot_and_export(monkeypatch, tmp_path: Path) -> None:
+    source = _build_test_db(tmp_path)
+    monkeypatch.setattr(wallet_metrics, "DUCKDB_PATH", source)
+    with wallet_metrics.open_read_snapshot() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM transactions").fetchone() == (1,)
+
+    export_dir = wallet_metrics.export_db_snapshot(tmp_path / "export")
+    exported = pd.read_parquet(next(export_dir.glob("transactions*.parquet")))
+    assert exported["tx_id"].tolist() == ["tx1"]
+    assert (export_dir / "schema.sql").exists()
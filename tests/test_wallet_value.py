@@ -94,6 +94,39 @@ def test_compute_wallet_windows_basic():
     assert abs(b_row["fee_stx_sum"] - 0.001) < 1e-12
 
 
+def test_compute_wallet_windows_accepts_enriched_activity():
+    activity = _activity_fixture()
+    first_seen = _first_seen_fixture()
+    prices = _price_panel_fixture()
+    enriched = wallet_value._enrich_activity_with_prices(activity, prices)
+
+    expected = wallet_value.compute_wallet_windows(
+        activity, first_seen, prices, windows=(15, 30)
+    )
+    # An empty panel would zero NV if the activity were re-enriched.
+    windows = wallet_value.compute_wallet_windows(
+        enriched, first_seen, prices.iloc[0:0], windows=(15, 30)
+    )
+
+    pd.testing.assert_frame_equal(windows, expected)
+
+
+def test_compute_wallet_windows_tolerates_duplicate_first_seen():
+    activity = _activity_fixture()
+    first_seen = _first_seen_fixture()
+    prices = _price_panel_fixture()
+    duplicated = pd.concat([first_seen, first_seen.iloc[[0]]], ignore_index=True)
+
+    expected = wallet_value.compute_wallet_windows(
+        activity, first_seen, prices, windows=(15, 30)
+    )
+    windows = wallet_value.compute_wallet_windows(
+        activity, duplicated, prices, windows=(15, 30)
+    )
+
+    pd.testing.assert_frame_equal(windows, expected)
+
+
 def test_classification_with_balance_lookup():
     activity = _activity_fixture()
     first_seen = _first_seen_fixture()
@@ -127,6 +160,46 @@ def test_classification_with_balance_lookup():
     assert bool(b.value_30d) is False
 
 
+def test_classification_refreshes_missing_balances(monkeypatch):
+    first_seen = pd.concat(
+        [
+            _first_seen_fixture(),
+            pd.DataFrame(
+                {"address": ["C"], "first_seen": [pd.Timestamp("2025-03-04T00:00Z")]}
+            ),
+        ],
+        ignore_index=True,
+    )
+    stored = pd.DataFrame({"address": ["A"], "balance_ustx": [20_000_000]})
+    refreshed = pd.DataFrame({"address": ["B"], "balance_ustx": [15_000_000]})
+    requested: list[list[str]] = []
+
+    def fake_load(addresses, *, as_of_date, max_age_days=7, db_path=None):
+        return refreshed if max_age_days is None else stored
+
+    def fake_ensure(addresses, **kwargs):
+        requested.append(list(addresses))
+
+    monkeypatch.setattr(wallet_value.wallet_metrics, "load_wallet_balances", fake_load)
+    monkeypatch.setattr(
+        wallet_value.wallet_metrics, "ensure_wallet_balances", fake_ensure
+    )
+
+    classified = wallet_value.classify_wallets(
+        first_seen=first_seen,
+        activity=_activity_fixture(),
+        windows_agg=pd.DataFrame(),
+        thresholds=wallet_value.ClassificationThresholds(funded_stx_min=10.0),
+    )
+
+    assert requested == [["B", "C"]]
+    assert classified.set_index("address")["funded"].to_dict() == {
+        "A": True,
+        "B": True,
+        "C": False,
+    }
+
+
 def test_compute_network_daily_and_kpis():
     activity = _activity_fixture()
     activity["fee_stx"] = activity["fee_ustx"] / wallet_value.MICROSTX_PER_STX
@@ -158,6 +231,29 @@ def test_compute_network_daily_and_kpis():
     assert round(kpis["total_fee_stx"], 3) == 1.501
 
 
+def test_compute_network_daily_counts_distinct_wallets():
+    activity = pd.DataFrame(
+        {
+            "tx_id": ["t1", "t2", "t3", "t4", "t5"],
+            "address": ["A", "A", "B", None, "A"],
+            "block_time": [
+                pd.Timestamp("2025-03-01T01:00Z"),
+                pd.Timestamp("2025-03-01T05:00Z"),
+                pd.Timestamp("2025-03-01T09:00Z"),
+                pd.Timestamp("2025-03-02T01:00Z"),
+                pd.Timestamp("2025-03-02T02:00Z"),
+            ],
+            "fee_stx": [1.0, 1.0, 1.0, 1.0, 1.0],
+            "nv_btc": [0.0, 0.0, 0.0, 0.0, 0.0],
+        }
+    )
+
+    daily = wallet_value.compute_network_daily(activity)
+
+    assert daily["tx_count"].tolist() == [3, 2]
+    assert daily["wallets"].tolist() == [2, 1]
+
+
 def test_compute_cpa_panel():
     activity = _activity_fixture()
     first_seen = _first_seen_fixture()
@@ -173,6 +269,20 @@ def test_compute_cpa_panel():
     assert panel["payback_multiple"].iloc[0] > 0
 
 
+def test_compute_cpa_panel_accepts_naive_activation_dates():
+    windows = wallet_value.compute_wallet_windows(
+        _activity_fixture(), _first_seen_fixture(), _price_panel_fixture(), windows=(30,)
+    )
+    naive = windows.assign(
+        activation_date=windows["activation_date"].dt.tz_localize(None)
+    )
+
+    panel = wallet_value.compute_cpa_panel(naive, window_days=30, min_wallets=1)
+
+    expected = wallet_value.compute_cpa_panel(windows, window_days=30, min_wallets=1)
+    pd.testing.assert_frame_equal(panel, expected)
+
+
 def test_compute_cpa_panel_invalid_inputs():
     activity = _activity_fixture()
     first_seen = _first_seen_fixture()
@@ -270,6 +380,17 @@ def test_compute_cpa_panel_by_channel():
     ads_row = panel[panel["channel"] == "ads"].iloc[0]
     assert pytest.approx(ads_row["payback_multiple"]) == 2.0
 
+    # Zero or unknown CAC leaves the payback undefined.
+    panel = wallet_value.compute_cpa_panel_by_channel(
+        windows_agg,
+        channel_map,
+        window_days=180,
+        cac_by_channel={"ads": 0.0},
+        min_wallets=1,
+    )
+    assert panel["payback_multiple"].isna().all()
+    assert panel["payback_multiple"].iloc[0] is pd.NA
+
 
 def test_compute_trailing_wallet_windows_and_summary():
     activity = _activity_fixture()
@@ -310,3 +431,24 @@ def test_trailing_handles_price_panel_without_stx_btc():
     )
     # No error and result may be empty (since window small) but should be DataFrame
     assert isinstance(trailing, pd.DataFrame)
+
+
+def test_load_price_panel_for_activity_memoizes_range(monkeypatch):
+    calls: list[bool] = []
+
+    def fake_panel(start, end, *, frequency="1h", force_refresh=False):
+        calls.append(force_refresh)
+        return _price_panel_fixture()
+
+    monkeypatch.setattr(wallet_value, "_PRICE_PANEL_MEMO", {})
+    monkeypatch.setattr(wallet_value.prices, "load_price_panel", fake_panel)
+    activity = _activity_fixture()
+
+    first = wallet_value.load_price_panel_for_activity(activity)
+    first["stx_btc"] = 0.0
+    second = wallet_value.load_price_panel_for_activity(activity)
+    wallet_value.load_price_panel_for_activity(activity, force_refresh=True)
+
+    assert calls == [False, True]
+    assert list(second.columns) == ["ts", "stx_btc"]
+    assert (second["stx_btc"] == 0.000015).all()